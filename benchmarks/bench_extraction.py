@@ -0,0 +1,107 @@
+"""
+Benchmark the single-pass extractor against the original BeautifulSoup path.
+
+Usage:
+    python benchmarks/bench_extraction.py [--iterations 50] [--json results.json]
+
+Runs every saved page in benchmarks/fixtures/, checks that both extractors
+return the same data and reports throughput (pages/sec) and peak traced
+memory per page for each.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction import extract_page_data, extract_page_data_bs4
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+EXTRACTORS = {
+    "single_pass": extract_page_data,
+    "bs4_multi_pass": extract_page_data_bs4,
+}
+
+
+def load_fixtures():
+    """Load saved HTML pages as {filename: html}"""
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+
+def measure(extractor, html: str, iterations: int):
+    """Return (pages/sec, peak bytes) for one extractor on one page"""
+    extractor(html)  # Warm-up
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        extractor(html)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    extractor(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return iterations / elapsed, peak
+
+
+def run(iterations: int):
+    pages = load_fixtures()
+    report = {"iterations": iterations, "pages": {}}
+
+    for name, html in pages.items():
+        outputs = {label: extractor(html) for label, extractor in EXTRACTORS.items()}
+        entry = {
+            "size_bytes": len(html.encode("utf-8")),
+            "identical_output": outputs["single_pass"] == outputs["bs4_multi_pass"],
+        }
+        for label, extractor in EXTRACTORS.items():
+            pages_per_sec, peak = measure(extractor, html, iterations)
+            entry[label] = {"pages_per_sec": round(pages_per_sec, 1), "peak_memory_bytes": peak}
+        entry["speedup"] = round(entry["single_pass"]["pages_per_sec"] /
+                                 entry["bs4_multi_pass"]["pages_per_sec"], 2)
+        entry["memory_ratio"] = round(entry["single_pass"]["peak_memory_bytes"] /
+                                      max(entry["bs4_multi_pass"]["peak_memory_bytes"], 1), 3)
+        report["pages"][name] = entry
+
+    return report
+
+
+def print_report(report):
+    print(f"{'fixture':<24}{'size':>10}{'same':>6}{'single p/s':>12}{'bs4 p/s':>10}"
+          f"{'speedup':>9}{'single peak':>13}{'bs4 peak':>11}")
+    for name, entry in report["pages"].items():
+        print(f"{name:<24}{entry['size_bytes']:>10}{'yes' if entry['identical_output'] else 'NO':>6}"
+              f"{entry['single_pass']['pages_per_sec']:>12}{entry['bs4_multi_pass']['pages_per_sec']:>10}"
+              f"{entry['speedup']:>8}x"
+              f"{entry['single_pass']['peak_memory_bytes'] // 1024:>11}KB"
+              f"{entry['bs4_multi_pass']['peak_memory_bytes'] // 1024:>9}KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    report = run(args.iterations)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if not all(entry["identical_output"] for entry in report["pages"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Offline benchmark suite for the extraction, parsing and API paths.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--requests 200] [--concurrency 16] [--latency 0.2]
+                                        [--json results.json] [--baseline previous.json]
+
+Everything runs locally: the saved pages in benchmarks/fixtures/ are served
+by a local HTTP server for parsing, and analyses go to an in-process
+fake_openai_server with the given latency (PROXY_API_URL is pointed at it).
+The app runs in a temporary working directory, so history and caches of the
+benchmark do not touch the real ones.
+
+Reports extraction pages/sec, parse_url pages/sec and latency, p50/p95/p99
+latency and throughput of API endpoints under concurrent load, and traced
+memory per request. With --baseline, metrics that got worse by more than
+--threshold are listed and the exit status is 1.
+"""
+import argparse
+import asyncio
+import functools
+import glob
+import http.server
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_openai_server import serve as serve_fake_openai
+
+# App modules (config first of all) are imported only once the environment
+# points at the fake server and the working directory is the temporary one
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SCREENSHOTS_DIR = os.path.join(FIXTURES_DIR, "screenshots")
+
+# Metrics where a lower value is better; all others are better when higher
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "mean_ms", "errors", "peak_bytes_per_request",
+                   "retained_bytes_per_request")
+
+
+def percentiles(samples):
+    """p50/p95/p99 and mean in milliseconds"""
+    if len(samples) < 2:
+        samples = samples * 2 or [0.0, 0.0]
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50_ms": round(cuts[49] * 1000, 2), "p95_ms": round(cuts[94] * 1000, 2),
+            "p99_ms": round(cuts[98] * 1000, 2), "mean_ms": round(statistics.fmean(samples) * 1000, 2)}
+
+
+class _FixtureHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_in_thread(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def load_screenshots():
+    """Saved screenshots as {filename: bytes}"""
+    shots = {}
+    for path in sorted(glob.glob(os.path.join(SCREENSHOTS_DIR, "*"))):
+        with open(path, "rb") as f:
+            shots[os.path.basename(path)] = f.read()
+    return shots
+
+
+def bench_extraction(iterations: int):
+    """Single-pass extraction throughput per fixture page and overall"""
+    from bench_extraction import load_fixtures, measure
+    from extraction import extract_page_data
+    pages = load_fixtures()
+    report = {"pages": {}}
+    total_bytes, total_seconds = 0, 0.0
+    for name, html in pages.items():
+        pages_per_sec, peak = measure(extract_page_data, html, iterations)
+        report["pages"][name] = {"pages_per_sec": round(pages_per_sec, 1), "peak_memory_bytes": peak}
+        total_bytes += len(html.encode("utf-8"))
+        total_seconds += 1 / pages_per_sec
+    report["pages_per_sec"] = round(len(pages) / total_seconds, 1)
+    report["mb_per_sec"] = round(total_bytes / total_seconds / 1e6, 2)
+    return report
+
+
+def bench_parsing(base_url: str, rounds: int, workers: int):
+    """parse_url over HTTP from the local fixture server (fetch, extraction and result building)"""
+    from bench_extraction import load_fixtures
+    from config import SITE_SETTINGS
+    from parsingservice import ParsingService
+    SITE_SETTINGS[base_url.split("//", 1)[1]] = {"tier": "http"}  # No browser fallback offline
+    service = ParsingService()
+    urls = [f"{base_url}/{name}" for name in load_fixtures()] * rounds
+
+    def parse(url):
+        started = time.perf_counter()
+        result = service.parse_url(url, use_cache=False)
+        return time.perf_counter() - started, result["success"]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = list(executor.map(parse, urls))
+    elapsed = time.perf_counter() - started
+    return dict(percentiles([seconds for seconds, _ in outcomes]), pages=len(urls), workers=workers,
+                pages_per_sec=round(len(urls) / elapsed, 1), errors=sum(not ok for _, ok in outcomes))
+
+
+def endpoint_scenarios(screenshots):
+    """(name, request kwargs factory) of every benchmarked endpoint; factories take the request index"""
+    from main import app  # Imported after the environment points at the fake server
+    image_names = list(screenshots)
+
+    def text_body(index):
+        # Distinct texts keep the analysis cache out of the measurement
+        return {"json": {"text": f"Benchmark request {index}. " + "Competitor landing page copy. " * 40,
+                         "bypass_cache": True}}
+
+    def image_body(index):
+        name = image_names[index % len(image_names)]
+        return {"files": {"file": (name, screenshots[name])}, "params": {"bypass_cache": "true"}}
+
+    scenarios = [
+        ("POST /analyzetext", "POST", "/analyzetext", text_body),
+        ("POST /analyzetext/stream", "POST", "/analyzetext/stream", text_body),
+        ("GET /history", "GET", "/history", lambda index: {"params": {"limit": 50}}),
+        ("GET /history/search", "GET", "/history/search", lambda index: {"params": {"q": "landing"}}),
+    ]
+    if image_names:
+        scenarios.insert(1, ("POST /analyzeimage", "POST", "/analyzeimage", image_body))
+    return app, scenarios
+
+
+async def run_load(app, method: str, path: str, make_request, requests: int, concurrency: int):
+    """Send `requests` requests with `concurrency` in flight; returns latencies and error count"""
+    import httpx
+    latencies, errors = [], 0
+    queue = iter(range(requests))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=300) as client:
+        async def worker():
+            nonlocal errors
+            for index in queue:
+                started = time.perf_counter()
+                response = await client.request(method, path, **make_request(index))
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+async def bench_endpoints(screenshots, requests: int, concurrency: int, memory_requests: int):
+    """Latency percentiles and throughput per endpoint, then a traced pass for memory per request"""
+    from openaiservice import close_async_client
+    app, scenarios = endpoint_scenarios(screenshots)
+    report = {}
+    for name, method, path, make_request in scenarios:
+        await run_load(app, method, path, make_request, min(concurrency, requests), concurrency)  # Warm-up
+        latencies, errors, elapsed = await run_load(app, method, path, make_request, requests, concurrency)
+        entry = dict(percentiles(latencies), requests=requests, concurrency=concurrency, errors=errors,
+                     requests_per_sec=round(requests / elapsed, 1))
+
+        # Separate pass: tracing slows allocation-heavy code down too much to time it
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await run_load(app, method, path, make_request, memory_requests, concurrency)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        entry["peak_bytes_per_request"] = (peak - baseline) // max(1, min(concurrency, memory_requests))
+        entry["retained_bytes_per_request"] = max(0, current - baseline) // max(1, memory_requests)
+        report[name] = entry
+        print(f"  {name:<28} p50 {entry['p50_ms']:>8}ms  p95 {entry['p95_ms']:>8}ms  "
+              f"p99 {entry['p99_ms']:>8}ms  {entry['requests_per_sec']:>7} req/s  errors {errors}")
+    await close_async_client()
+    return report
+
+
+def flatten(report, prefix=""):
+    """{"section.name.metric": value} of every numeric metric"""
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(report, baseline, threshold: float):
+    """Metrics that changed by more than `threshold` (relative), worst regressions first"""
+    current, previous = flatten(report["results"]), flatten(baseline["results"])
+    changes = []
+    for key, value in current.items():
+        old = previous.get(key)
+        metric = key.rsplit(".", 1)[-1]
+        if not old or metric in ("requests", "concurrency", "pages", "workers"):
+            continue
+        change = (value - old) / old
+        worse = change > threshold if metric in LOWER_IS_BETTER else change < -threshold
+        better = change < -threshold if metric in LOWER_IS_BETTER else change > threshold
+        if worse or better:
+            changes.append({"metric": key, "baseline": old, "current": value,
+                            "change": round(change, 3), "regression": worse})
+    changes.sort(key=lambda item: (not item["regression"], -abs(item["change"])))
+    return changes
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight per endpoint")
+    parser.add_argument("--memory-requests", type=int, default=50, help="Requests of the traced memory pass")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds the fake OpenAI server adds per call")
+    parser.add_argument("--iterations", type=int, default=50, help="Extraction runs per fixture page")
+    parser.add_argument("--parse-rounds", type=int, default=20, help="Times every fixture page is parsed")
+    parser.add_argument("--parse-workers", type=int, default=4)
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Report of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change counted as a regression")
+    args = parser.parse_args()
+    args.json = args.json and os.path.abspath(args.json)
+    args.baseline = args.baseline and os.path.abspath(args.baseline)
+
+    fake_openai = serve_fake_openai(port=0, latency=args.latency)
+    fixture_server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(_FixtureHandler, directory=FIXTURES_DIR)
+    )
+    fixture_server.daemon_threads = True
+    # Client-side rate limits sized for a real account would throttle the fake server
+    os.environ.update(PROXY_API_KEY="bench", PROXY_API_URL=start_in_thread(fake_openai) + "/v1",
+                      SCHEDULER_ENABLED="0", OPENAI_RPM_LIMIT="1000000", OPENAI_TPM_LIMIT="1000000000")
+    original_cwd = os.getcwd()
+    workdir = tempfile.TemporaryDirectory(prefix="competitor-bench-")
+    os.chdir(workdir.name)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fake_openai_latency": args.latency,
+        },
+        "results": {}
+    }
+    print("Extraction")
+    report["results"]["extraction"] = bench_extraction(args.iterations)
+    print(f"  {report['results']['extraction']['pages_per_sec']} pages/s")
+    print("Parsing")
+    parsing = bench_parsing(start_in_thread(fixture_server), args.parse_rounds, args.parse_workers)
+    report["results"]["parsing"] = parsing
+    print(f"  {parsing['pages_per_sec']} pages/s, p95 {parsing['p95_ms']}ms, errors {parsing['errors']}")
+    print(f"Endpoints ({args.requests} requests, {args.concurrency} concurrent)")
+    report["results"]["endpoints"] = asyncio.run(
+        bench_endpoints(load_screenshots(), args.requests, args.concurrency, args.memory_requests)
+    )
+
+    fake_openai.shutdown()
+    fixture_server.shutdown()
+    os.chdir(original_cwd)
+    workdir.cleanup()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            changes = compare(report, json.load(f), args.threshold)
+        report["comparison"] = {"baseline": args.baseline, "threshold": args.threshold, "changes": changes}
+        regressions = [change for change in changes if change["regression"]]
+        print(f"Compared with {args.baseline}: {len(regressions)} regressions, "
+              f"{len(changes) - len(regressions)} improvements over {args.threshold:.0%}")
+        for change in changes:
+            print(f"  {'WORSE' if change['regression'] else 'better':<7}{change['metric']:<60}"
+                  f"{change['baseline']:>12} -> {change['current']:<12}({change['change']:+.1%})")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
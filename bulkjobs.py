@@ -0,0 +1,197 @@
+"""
+Offline bulk analysis through the OpenAI Batch API.
+
+Usage:
+    python bulkjobs.py [--texts texts.txt] [--images shot1.png shot2.png ...] [--no-wait]
+    python bulkjobs.py --resume <batch_id> --job-file bulk_jobs/<job>.jsonl
+
+Each line of the texts file is analyzed as one text. All requests are written
+to a single JSONL job file, submitted through the configured client (so
+PROXY_API_URL can point at a local stand-in such as fake_openai_server.py),
+polled until the batch finishes and ingested into history with the same
+result shape as analyze_text / analyze_image.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from config import BULK_JOBS_DIR, BULK_POLL_INTERVAL
+from historystore import get_history_store
+from openaiservice import (
+    client, build_text_request, prepare_image_request, read_image, parse_image_content,
+    success_result, failure_result
+)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def build_job_file(items: List[Dict[str, Any]], path: Optional[str] = None) -> str:
+    """
+    Write one Batch API request per item. Items are {"type": "text", "text": ...}
+    or {"type": "image", "image": <path or bytes>}; the line index is the custom_id.
+    """
+    if path is None:
+        os.makedirs(BULK_JOBS_DIR, exist_ok=True)
+        path = os.path.join(BULK_JOBS_DIR, f"job_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl")
+
+    with open(path, "w", encoding="utf-8") as f:
+        for index, item in enumerate(items):
+            if item["type"] == "text":
+                body = build_text_request(item["text"])
+            elif item["type"] == "image":
+                body, _ = prepare_image_request(read_image(item["image"]))
+            else:
+                raise ValueError(f"Unknown item type: {item['type']}")
+            line = {"custom_id": f"{index}-{item['type']}", "method": "POST",
+                    "url": BATCH_ENDPOINT, "body": body}
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return path
+
+
+def submit_job(job_file: str):
+    """Upload the job file and create a batch for it"""
+    with open(job_file, "rb") as f:
+        uploaded = client.files.create(file=f, purpose="batch")
+    return client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+        metadata={"source": "competitor-analyzer", "job_file": os.path.basename(job_file)}
+    )
+
+
+def wait_for_job(batch_id: str, poll_interval: float = BULK_POLL_INTERVAL,
+                 timeout: Optional[float] = None):
+    """Poll the batch until it reaches a final status"""
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        progress = f" ({counts.completed}/{counts.total})" if counts else ""
+        print(f"Batch {batch_id}: {batch.status}{progress}")
+        if batch.status in FINAL_STATUSES:
+            return batch
+        if deadline and time.monotonic() > deadline:
+            raise TimeoutError(f"Batch {batch_id} did not finish in {timeout}s")
+        time.sleep(poll_interval)
+
+
+def _read_output_lines(file_id: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    if not file_id:
+        return {}
+    lines = {}
+    for raw_line in client.files.content(file_id).text.splitlines():
+        if raw_line.strip():
+            line = json.loads(raw_line)
+            lines[line["custom_id"]] = line
+    return lines
+
+
+def _result_from_line(item_type: str, line: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert one Batch API output line to the analyze_text/analyze_image result shape"""
+    if line is None:
+        return failure_result(RuntimeError("No output for this request"))
+    if line.get("error"):
+        return failure_result(RuntimeError(line["error"].get("message", str(line["error"]))))
+    response = line.get("response") or {}
+    if response.get("status_code") != 200:
+        return failure_result(RuntimeError(f"Request failed with status {response.get('status_code')}"))
+    try:
+        content = response["body"]["choices"][0]["message"]["content"]
+        analysis = parse_image_content(content) if item_type == "image" else json.loads(content)
+        return success_result(analysis, content)
+    except Exception as e:
+        return failure_result(e)
+
+
+def ingest_job(batch, job_file: str) -> List[Dict[str, Any]]:
+    """Match output and error lines back to the job file, in job order"""
+    outputs = _read_output_lines(batch.output_file_id)
+    outputs.update(_read_output_lines(batch.error_file_id))
+
+    results = []
+    with open(job_file, "r", encoding="utf-8") as f:
+        for raw_line in f:
+            request = json.loads(raw_line)
+            custom_id = request["custom_id"]
+            item_type = custom_id.split("-", 1)[1]
+            results.append({
+                "custom_id": custom_id,
+                "type": item_type,
+                "result": _result_from_line(item_type, outputs.get(custom_id))
+            })
+    return results
+
+
+def save_to_history(batch, results: List[Dict[str, Any]]) -> int:
+    """Save the ingested bulk job as one history record and return its id"""
+    history_entry = {
+        "type": "bulk_analysis",
+        "timestamp": datetime.now().isoformat(),
+        "batch_id": batch.id,
+        "status": batch.status,
+        "total": len(results),
+        "succeeded": sum(1 for item in results if item["result"]["success"]),
+        "items": results
+    }
+
+    history_id = get_history_store().add(history_entry)
+    print(f"Results saved to history record: {history_id}")
+    return history_id
+
+
+def run_bulk_job(items: List[Dict[str, Any]], poll_interval: float = BULK_POLL_INTERVAL,
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Build, submit, wait for and ingest one bulk job"""
+    job_file = build_job_file(items)
+    batch = submit_job(job_file)
+    print(f"Submitted batch {batch.id} with {len(items)} requests ({job_file})")
+    batch = wait_for_job(batch.id, poll_interval, timeout)
+    results = ingest_job(batch, job_file)
+    history_id = save_to_history(batch, results)
+    return {"batch_id": batch.id, "status": batch.status, "results": results,
+            "history_id": history_id}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run text/image analyses as one OpenAI batch job")
+    parser.add_argument("--texts", help="File with one text to analyze per line")
+    parser.add_argument("--images", nargs="*", default=[], help="Image files to analyze")
+    parser.add_argument("--poll-interval", type=float, default=BULK_POLL_INTERVAL)
+    parser.add_argument("--no-wait", action="store_true", help="Submit and exit without waiting")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="Wait for and ingest an existing batch")
+    parser.add_argument("--job-file", help="Job file of the batch given with --resume")
+    args = parser.parse_args()
+
+    if args.resume:
+        if not args.job_file:
+            parser.error("--resume requires --job-file")
+        batch = wait_for_job(args.resume, args.poll_interval)
+        save_to_history(batch, ingest_job(batch, args.job_file))
+        return
+
+    items = []
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as f:
+            items.extend({"type": "text", "text": line.strip()} for line in f if line.strip())
+    items.extend({"type": "image", "image": path} for path in args.images)
+    if not items:
+        parser.error("Nothing to analyze: pass --texts and/or --images")
+
+    if args.no_wait:
+        job_file = build_job_file(items)
+        batch = submit_job(job_file)
+        print(f"Submitted batch {batch.id}; resume with: "
+              f"python bulkjobs.py --resume {batch.id} --job-file {job_file}")
+        return
+
+    outcome = run_bulk_job(items, args.poll_interval)
+    print(f"Batch {outcome['batch_id']} {outcome['status']}: "
+          f"{sum(1 for item in outcome['results'] if item['result']['success'])}/{len(items)} succeeded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Record/replay of OpenAI chat completions for offline development, profiling and benchmarks"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from openai.types.chat import ChatCompletion
+from config import OPENAI_CASSETTE_MODE, OPENAI_CASSETTE_FILE, OPENAI_CASSETTE_LATENCY
+
+MODES = ("off", "record", "replay")
+
+# Streaming settings do not change the model output, so they are not part of the key
+_UNKEYED_FIELDS = ("stream", "stream_options")
+
+
+class CassetteMiss(LookupError):
+    """Replay mode got a request that was never recorded"""
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """Canonical hash of chat completion arguments: key order and whitespace do not matter"""
+    canonical = {name: value for name, value in request.items() if name not in _UNKEYED_FIELDS}
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Request/response pairs in a JSON Lines file, one compact line per
+    recording (the latest line of a key wins). Recording appends; replay
+    loads the file once and serves responses from memory together with the
+    recorded latency scaled by `latency_scale` (0: no delay).
+    """
+
+    def __init__(self, mode: str = OPENAI_CASSETTE_MODE, path: str = OPENAI_CASSETTE_FILE,
+                 latency_scale: float = OPENAI_CASSETTE_LATENCY):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode: {mode} (expected one of {', '.join(MODES)})")
+        self.mode = mode
+        self.path = path
+        self.latency_scale = latency_scale
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if self._entries is None:
+                entries = {}
+                if os.path.exists(self.path):
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        for line in f:
+                            if line.strip():
+                                entry = json.loads(line)
+                                entries[entry["key"]] = entry
+                self._entries = entries
+            return self._entries
+
+    def replay(self, request: Dict[str, Any]) -> Tuple[ChatCompletion, float]:
+        """Recorded response to `request` and the seconds to wait before returning it"""
+        key = request_key(request)
+        entry = self._load().get(key)
+        if entry is None:
+            raise CassetteMiss(f"No recorded response for request {key[:12]} in {self.path}; "
+                               f"record it with OPENAI_CASSETTE_MODE=record")
+        return ChatCompletion.model_validate(entry["response"]), entry["latency"] * self.latency_scale
+
+    def record(self, request: Dict[str, Any], response: ChatCompletion, latency: float):
+        """Save the response to `request`"""
+        self._append(request_key(request), response.model_dump(mode="json", exclude_none=True), latency)
+
+    def record_content(self, request: Dict[str, Any], content: str, latency: float):
+        """Save the assembled text of a streamed response as a regular completion"""
+        response = {
+            "id": "chatcmpl-cassette",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", ""),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}]
+        }
+        self._append(request_key(request), response, latency)
+
+    def _append(self, key: str, response: Dict[str, Any], latency: float):
+        entry = {"key": key, "recorded_at": time.time(), "latency": round(latency, 3), "response": response}
+        entries = self._load()
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n")
+            entries[key] = entry
+
+    def compact(self) -> int:
+        """Rewrite the file with only the latest recording of every key; returns the entry count"""
+        entries = self._load()
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in entries.values():
+                    f.write(json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+        return len(entries)
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The process-wide cassette, or None when OPENAI_CASSETTE_MODE is off"""
+    global _cassette
+    if OPENAI_CASSETTE_MODE == "off":
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette()
+        return _cassette
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or compact an OpenAI cassette file")
+    parser.add_argument("path", nargs="?", default=OPENAI_CASSETTE_FILE)
+    parser.add_argument("--compact", action="store_true", help="Keep only the latest recording of every key")
+    args = parser.parse_args()
+
+    cassette = Cassette(mode="replay", path=args.path)
+    if args.compact:
+        size_before = os.path.getsize(args.path) if os.path.exists(args.path) else 0
+        count = cassette.compact()
+        print(f"{args.path}: {count} recordings, {size_before} -> {os.path.getsize(args.path)} bytes")
+        return
+    entries = cassette._load()
+    latencies = [entry["latency"] for entry in entries.values()]
+    print(json.dumps({
+        "path": args.path,
+        "recordings": len(entries),
+        "bytes": os.path.getsize(args.path) if os.path.exists(args.path) else 0,
+        "mean_latency": round(sum(latencies) / len(latencies), 3) if latencies else None
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
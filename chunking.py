@@ -0,0 +1,100 @@
+"""Token-aware splitting of long text on its structure (headings, paragraphs, sentences)"""
+import math
+import re
+from typing import List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # Optional: token counts fall back to a characters-per-token estimate
+    tiktoken = None
+
+TOKEN_ENCODING = "o200k_base"  # Tokenizer of gpt-4o
+CHARS_PER_TOKEN = 4
+
+# Tried in order: a piece still over budget is split again on the next separator.
+# Extracted page text marks heading sections with blank lines and other blocks with line breaks.
+_SEPARATORS = (
+    (re.compile(r"\n(?=#{1,6}\s)"), "\n"),  # Markdown headings
+    (re.compile(r"\n\s*\n"), "\n\n"),  # Paragraphs, heading sections of page text
+    (re.compile(r"\n"), "\n"),  # Lines, blocks of page text
+    (re.compile(r"(?<=[.!?])\s+"), " "),  # Sentences
+    (re.compile(r"\s+"), " "),  # Words
+)
+
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and tiktoken is not None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception:
+            # The encoding file is downloaded on first use and may be unavailable offline
+            _encoding_failed = True
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of `text` (exact with tiktoken installed, estimated otherwise)"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Split `text` into chunks of at most about `max_tokens` tokens, breaking on
+    headings first, then paragraphs, lines, sentences and words. Adjacent
+    pieces are packed together while they fit. Text within the budget comes
+    back as a single chunk.
+    """
+    text = text.strip()
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    return _split(text, max_tokens, 0)
+
+
+def _split(text: str, max_tokens: int, level: int, carry: Optional[str] = None,
+           carry_joiner: str = "") -> List[str]:
+    """
+    Split on the separator of `level`. `carry` is the unfinished chunk of the
+    enclosing level (e.g. a heading): pieces keep packing onto it, joined
+    with `carry_joiner`, and the last chunk returned is still open for packing.
+    """
+    if level == len(_SEPARATORS):
+        return ([carry] if carry is not None else []) + _hard_split(text, max_tokens)
+
+    separator, joiner = _SEPARATORS[level]
+    chunks: List[str] = []
+    current = carry
+    current_tokens = estimate_tokens(carry) if carry is not None else 0
+    current_joiner = carry_joiner
+    for piece in separator.split(text):
+        piece = piece.strip()
+        if not piece:
+            continue
+        tokens = estimate_tokens(piece)
+        if tokens > max_tokens:
+            parts = _split(piece, max_tokens, level + 1, current, current_joiner)
+            chunks.extend(parts[:-1])
+            current, current_tokens = parts[-1], estimate_tokens(parts[-1])
+        elif current is not None and current_tokens + tokens <= max_tokens:
+            current = f"{current}{current_joiner}{piece}"
+            current_tokens += tokens
+        else:
+            if current is not None:
+                chunks.append(current)
+            current, current_tokens = piece, tokens
+        current_joiner = joiner
+    if current is not None:
+        chunks.append(current)
+    return chunks
+
+
+def _hard_split(text: str, max_tokens: int) -> List[str]:
+    """Cut text without any separators (e.g. a very long URL) into fixed-size slices"""
+    size = max(1, len(text) * max_tokens // max(1, estimate_tokens(text)))
+    return [text[start:start + size] for start in range(0, len(text), size)]
@@ -12,6 +12,50 @@ PROXY_API_URL = os.getenv("PROXY_API_URL")
 # Use Proxy API if configured, otherwise use OpenAI
 USE_PROXY = bool(PROXY_API_KEY and PROXY_API_URL)
 
+# Async OpenAI client used by the API endpoints
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))  # In-flight analyses
+OPENAI_MAX_CONNECTIONS = 20  # Pooled HTTP connections to the API
+OPENAI_TIMEOUT = 120  # Seconds per API request
+
+# Client-side rate limiting of OpenAI requests. The per-minute limits are the
+# starting point; x-ratelimit-* response headers replace them as replies arrive.
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "30000"))
+# Completion tokens reserved per request until its usage settles the estimate;
+# reserving the full max_tokens would stall a cold start at the default TPM
+OPENAI_COMPLETION_ESTIMATE = int(os.getenv("OPENAI_COMPLETION_ESTIMATE", "500"))
+OPENAI_MIN_CONCURRENCY = 1  # Adaptive concurrency stays between this and OPENAI_MAX_CONCURRENCY
+OPENAI_MAX_RETRIES = 4  # Retries of connection errors, 408/409/429 and 5xx responses
+OPENAI_RETRY_BASE = 0.5  # Seconds before the first retry, doubled per attempt (with full jitter)
+OPENAI_RETRY_MAX = 30
+
+# Long text is split into chunks of at most this many tokens, analyzed
+# concurrently and merged by one more request
+TEXT_CHUNK_TOKENS = 3000
+TEXT_CHUNK_CONCURRENCY = 8  # Chunk analyses of one text in flight at a time
+TEXT_REDUCE_FANIN = 8  # Analyses merged per request; more are merged in rounds first
+
+# Image preprocessing before vision analysis
+IMAGE_PREPROCESS = True
+IMAGE_MAX_EDGE = 1536  # Longest side in pixels after downscaling
+IMAGE_JPEG_QUALITY = 85
+IMAGE_DETAIL = "auto"  # "low", "high" or "auto" (low for images up to IMAGE_LOW_DETAIL_MAX_EDGE)
+IMAGE_LOW_DETAIL_MAX_EDGE = 512
+
+# Offline bulk jobs (OpenAI Batch API)
+BULK_JOBS_DIR = "bulk_jobs"
+BULK_POLL_INTERVAL = 30  # Seconds between batch status checks
+
+# Image uploads are handled in memory
+UPLOAD_MAX_BYTES = 20 * 1024 * 1024  # Larger uploads are rejected with 413
+UPLOAD_FORM_OVERHEAD = 16 * 1024  # Multipart framing allowed per file on top of its bytes
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+# Batch analysis endpoints
+BATCH_MAX_ITEMS = 200
+BATCH_MAX_CONCURRENCY = 8  # Items of one batch analyzed at the same time
+BATCH_MAX_BYTES = 100 * 1024 * 1024  # All images of one batch together, held in memory while it runs
+
 # Competitor URLs for parsing
 COMPETITOR_URLS = [
     "https://example-competitor1.com",
@@ -19,13 +63,113 @@ COMPETITOR_URLS = [
     "https://example-competitor3.com",
 ]
 
+# Parsing Configuration
+PARSING_CONCURRENT = True
+PARSING_MAX_WORKERS = int(os.getenv("PARSING_MAX_WORKERS", "4"))
+PARSING_HOST_DELAY = 2  # Seconds between requests to the same host
+
+# Multi-page crawling: follow same-site links from each parsed page
+CRAWL_MAX_DEPTH = 2  # Link hops from the start page
+CRAWL_MAX_PAGES = 50  # Page budget per site
+CRAWL_HOST_CONCURRENCY = 2  # Pages of one host fetched at the same time
+CRAWL_RESPECT_ROBOTS = True
+
+# Background parse jobs (/jobs)
+JOBS_MAX_WORKERS = 2  # Parse jobs running at the same time
+JOBS_MAX_KEPT = 100  # Finished jobs kept for polling
+
 # History storage
 HISTORY_DIR = "history"
 os.makedirs(HISTORY_DIR, exist_ok=True)
+HISTORY_DB_FILE = os.path.join(HISTORY_DIR, "history.db")  # Legacy JSON files in HISTORY_DIR are imported on startup
+
+# Browser identity used for both HTTP and Selenium fetches
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Fetch tier: "auto" tries plain HTTP first and falls back to Selenium when the
+# page needs JavaScript, "http" or "selenium" force a tier (per site via SITE_SETTINGS)
+FETCH_TIER = "auto"
+HTTP_TIMEOUT = 15
+HTTP_POOL_SIZE = 10  # Keep-alive connections per host
+HTTP_MIN_TEXT_LENGTH = 200  # Less body text than this is treated as a JS-rendered page
+PAGE_TEXT_LIMIT = 20000  # Characters of main/body text kept per page (long text is chunked for analysis)
+PAGE_LINK_LIMIT = 200  # Links kept per page; crawling follows them
+
+# Page cache: skip re-extraction of pages unchanged since the previous run
+CACHE_DIR = "cache"
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_FILE = os.path.join(CACHE_DIR, "pages.json")
+PAGE_CACHE_TTL = 7 * 24 * 3600  # Seconds before a cached page must be re-extracted
+PAGE_CACHE_MAX_ENTRIES = 1000
+
+# LLM analysis cache (memory + disk)
+LLM_CACHE_ENABLED = True
+LLM_CACHE_DIR = os.path.join(CACHE_DIR, "llm")
+LLM_CACHE_TTL = 30 * 24 * 3600  # Seconds before a cached analysis is recomputed
+LLM_CACHE_MAX_ENTRIES = 500  # In-memory LRU size
+LLM_CACHE_MAX_BYTES = 200 * 1024 * 1024  # Disk budget for cached analyses
+
+# Record/replay of OpenAI completions for offline development, profiling and benchmarks:
+# "off", "record" (call the API and save every request/response pair) or "replay"
+# (answer from the saved pairs only, without API calls; unknown requests fail).
+# Analysis cache hits never reach the API, so record with bypass_cache.
+OPENAI_CASSETTE_MODE = os.getenv("OPENAI_CASSETTE_MODE", "off")
+OPENAI_CASSETTE_FILE = os.getenv("OPENAI_CASSETTE_FILE", os.path.join(CACHE_DIR, "openai_cassette.jsonl"))
+OPENAI_CASSETTE_LATENCY = float(os.getenv("OPENAI_CASSETTE_LATENCY", "0"))  # Replay delay, fraction of the recorded latency
 
 # Selenium Configuration
 SELENIUM_HEADLESS = True
 SELENIUM_TIMEOUT = 30
+SELENIUM_POOL_SIZE = int(os.getenv("SELENIUM_POOL_SIZE", "2"))
+SELENIUM_MAX_PAGES_PER_DRIVER = 50  # Recycle a browser after this many page loads
+SELENIUM_LEASE_TIMEOUT = 120  # Seconds to wait for a free browser from the pool
+SELENIUM_LEASE_ATTEMPTS = 3  # Fresh browsers tried before a lease gives up on failed health checks
+
+# Fetch profiles for Selenium: resource categories to block and the page load
+# strategy ("normal" waits for the load event, "eager" for DOMContentLoaded).
+# Extraction only needs the DOM, so blocked images keep their src attributes.
+# Each profile gets its own browser pool of SELENIUM_POOL_SIZE.
+FETCH_PROFILES = {
+    "full": {"block": [], "page_load_strategy": "normal"},
+    "lean": {"block": ["images", "media", "fonts", "trackers"], "page_load_strategy": "normal"},
+    "fast": {"block": ["images", "media", "fonts", "trackers"], "page_load_strategy": "eager"},
+}
+FETCH_PROFILE = os.getenv("FETCH_PROFILE", "lean")  # Default profile, per site via SITE_SETTINGS "profile"
+# URL patterns (DevTools Network.setBlockedURLs wildcards) of each blockable category
+BLOCKED_RESOURCE_PATTERNS = {
+    "images": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico", "*.bmp"],
+    "media": ["*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav", "*.m4a", "*.mov", "*.m3u8", "*.mpd"],
+    "fonts": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "trackers": [
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+        "*connect.facebook.net*", "*mc.yandex.ru*", "*hotjar.com*", "*clarity.ms*", "*segment.io*",
+        "*segment.com/analytics*", "*mixpanel.com*", "*amplitude.com*", "*intercom.io*", "*hs-scripts.com*",
+        "*linkedin.com/px*", "*snap.licdn.com*", "*ads-twitter.com*", "*tiktok.com/i18n/pixel*"
+    ],
+}
+
+# Page readiness after load: ready_state, selector, dom_stable or network_idle
+PAGE_READY_STRATEGY = "ready_state"
+PAGE_READY_TIMEOUT = 10  # Hard cap in seconds for any readiness strategy
+PAGE_QUIET_WINDOW = 0.5  # Seconds without changes for dom_stable/network_idle
+
+# Per-site overrides keyed by host, e.g.
+# "example-competitor1.com": {"wait": "selector", "selector": "#pricing"},
+# "example-competitor2.com": {"wait": "network_idle", "wait_timeout": 15},
+# "example-competitor3.com": {"tier": "selenium", "profile": "full"},
+# "interval", "jitter" and "max_concurrency" override the monitoring schedule of a site
+SITE_SETTINGS = {}
+
+# Scheduled monitoring: every competitor URL is re-parsed on its own interval
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "0") == "1"  # Opt-in: it re-parses every competitor URL
+SCHEDULER_DB_FILE = os.path.join(HISTORY_DIR, "scheduler.db")
+SCHEDULE_INTERVAL = 6 * 3600  # Seconds between parses of a site
+SCHEDULE_JITTER = 0.1  # Random +/- fraction of the interval, so sites do not run in lockstep
+SCHEDULER_MAX_CONCURRENCY = 2  # Sites parsed at the same time
+SCHEDULER_HOST_CONCURRENCY = 1  # Scheduled pages of one host parsed at the same time
+SCHEDULE_BACKOFF_BASE = 300  # Seconds before the first retry of a failing site, doubled per failure
+SCHEDULE_BACKOFF_MAX = 24 * 3600
+SCHEDULE_REANALYZE = False  # Send changed content of scheduled parses to text analysis
 
 # API Configuration
 API_HOST = "0.0.0.0"
@@ -0,0 +1,274 @@
+"""Multi-page crawling of competitor sites with a deduplicating frontier"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+import requests
+from config import (
+    COMPETITOR_URLS, CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES, CRAWL_HOST_CONCURRENCY,
+    CRAWL_RESPECT_ROBOTS, PARSING_MAX_WORKERS, HTTP_TIMEOUT, USER_AGENT
+)
+from parsingservice import ParsingService, HostThrottle, get_http_session, get_parsing_service
+
+# Query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = {
+    "gclid", "fbclid", "msclkid", "yclid", "dclid", "mc_cid", "mc_eid", "_ga", "_gl", "igshid", "ref_src"
+}
+
+# Links to files that are not HTML pages
+SKIPPED_EXTENSIONS = (
+    ".pdf", ".zip", ".gz", ".rar", ".7z", ".exe", ".dmg", ".apk", ".doc", ".docx", ".xls", ".xlsx",
+    ".ppt", ".pptx", ".csv", ".xml", ".json", ".rss", ".jpg", ".jpeg", ".png", ".gif", ".webp",
+    ".svg", ".ico", ".bmp", ".mp3", ".mp4", ".avi", ".mov", ".webm", ".woff", ".woff2", ".ttf",
+    ".css", ".js"
+)
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(href: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Absolute, canonical form of a link: resolved against `base`, lowercase
+    host without the default port, no fragment, no tracking parameters and a
+    sorted query. None for links that are not http(s) pages.
+    """
+    url = urljoin(base, href.strip()) if base else href.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if ":" in host:
+        host = f"[{host}]"  # IPv6 literal
+    if port and port != _DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    path = parts.path or "/"
+    if path.lower().endswith(SKIPPED_EXTENSIONS):
+        return None
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not name.lower().startswith("utm_") and name.lower() not in TRACKING_PARAMS)
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def site_of(url: str) -> str:
+    """Site key of a URL: its host without www., so both variants count as one site"""
+    return (urlsplit(url).hostname or "").lower().removeprefix("www.")
+
+
+class SeenSet:
+    """
+    URLs already queued, kept as 64-bit hashes instead of strings so large
+    sites stay cheap (collisions are negligible at crawl sizes).
+    """
+
+    def __init__(self):
+        self._hashes = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(url: str) -> int:
+        return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def add(self, url: str) -> bool:
+        """Remember `url`; True if it was not seen before"""
+        key = self._hash(url)
+        with self._lock:
+            if key in self._hashes:
+                return False
+            self._hashes.add(key)
+            return True
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            return self._hash(url) in self._hashes
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+
+class RobotsCache:
+    """robots.txt of every host, fetched once per crawl"""
+
+    def __init__(self, user_agent: str = USER_AGENT):
+        self.user_agent = user_agent
+        self._parsers: Dict[str, RobotFileParser] = {}
+        self._origin_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _parser(self, url: str) -> RobotFileParser:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        parser = self._parsers.get(origin)
+        if parser is not None:
+            return parser
+        # One fetch per origin; other hosts are not held up while it runs
+        with self._lock:
+            origin_lock = self._origin_locks.setdefault(origin, threading.Lock())
+        with origin_lock:
+            parser = self._parsers.get(origin)
+            if parser is None:
+                parser = self._fetch(origin)
+                self._parsers[origin] = parser
+        return parser
+
+    @staticmethod
+    def _fetch(origin: str) -> RobotFileParser:
+        parser = RobotFileParser(origin + "/robots.txt")
+        try:
+            response = get_http_session().get(parser.url, timeout=HTTP_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"robots.txt of {origin} unavailable, not crawling it: {e}")
+            parser.disallow_all = True
+            return parser
+        # Same rules as RobotFileParser.read(): auth errors forbid, missing file allows
+        if response.status_code in (401, 403):
+            parser.disallow_all = True
+        elif 400 <= response.status_code < 500:
+            parser.allow_all = True
+        elif response.status_code >= 500:
+            parser.disallow_all = True
+        else:
+            parser.parse(response.text.splitlines())
+        return parser
+
+    def can_fetch(self, url: str) -> bool:
+        return self._parser(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url: str) -> Optional[float]:
+        delay = self._parser(url).crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+
+
+class Crawler:
+    """
+    Breadth-first crawl that follows same-site links of every parsed page up
+    to `max_depth` hops and `max_pages` pages per start URL. Pages are parsed
+    with ParsingService.parse_url, at most `host_concurrency` per host at a
+    time and with the usual per-host delay (or the robots.txt crawl-delay).
+    """
+
+    def __init__(self, service: Optional[ParsingService] = None, max_depth: int = CRAWL_MAX_DEPTH,
+                 max_pages: int = CRAWL_MAX_PAGES, host_concurrency: int = CRAWL_HOST_CONCURRENCY,
+                 max_workers: int = PARSING_MAX_WORKERS, respect_robots: bool = CRAWL_RESPECT_ROBOTS):
+        self.service = service or get_parsing_service()
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.host_concurrency = host_concurrency
+        self.max_workers = max_workers
+        self.robots = RobotsCache() if respect_robots else None
+        self.throttle = HostThrottle()
+        self._host_slots: Dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def crawl(self, seeds: Optional[List[str]] = None, use_cache: bool = True,
+              on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+              cancel: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
+        """
+        Crawl from every seed URL (default: COMPETITOR_URLS). Returns one
+        parse_url() result per page, in crawl order, each with
+        "crawl": {"site", "depth"}. `on_result(result)` is called as pages
+        finish; once `cancel` is set no further pages are started.
+        """
+        seen = SeenSet()
+        budgets: Dict[str, int] = {}
+        frontier: List[Tuple[str, str, int]] = []
+        for seed in COMPETITOR_URLS if seeds is None else seeds:
+            url = normalize_url(seed)
+            if url and seen.add(url):
+                site = site_of(url)
+                if budgets.get(site, 0) < self.max_pages:
+                    budgets[site] = budgets.get(site, 0) + 1
+                    frontier.append((url, site, 0))
+
+        results: List[Dict[str, Any]] = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers), thread_name_prefix="crawl") as executor:
+            while frontier and not (cancel is not None and cancel.is_set()):
+                # Level by level: every page of one depth is parsed before its links are followed
+                level = list(executor.map(lambda page: self._fetch(*page, use_cache, on_result, cancel), frontier))
+                results.extend(result for result in level if not result.get("cancelled"))
+                frontier = []
+                for result in level:
+                    if result["crawl"]["depth"] >= self.max_depth or not result.get("success"):
+                        continue
+                    frontier.extend(self._links(result, seen, budgets))
+
+        if self.service.page_cache is not None:
+            self.service.page_cache.save()
+        print(f"Crawled {len(results)} pages of {len(budgets)} sites in {time.perf_counter() - started:.1f}s")
+        return results
+
+    def _links(self, result: Dict[str, Any], seen: SeenSet,
+               budgets: Dict[str, int]) -> List[Tuple[str, str, int]]:
+        """New same-site links of a parsed page that fit the site's page budget"""
+        site, depth = result["crawl"]["site"], result["crawl"]["depth"] + 1
+        base = result.get("final_url") or result["url"]
+        pages = []
+        for link in (result.get("data") or {}).get("links", []):
+            if budgets[site] >= self.max_pages:
+                break
+            url = normalize_url(link.get("url", ""), base)
+            if url is None or site_of(url) != site or not seen.add(url):
+                continue
+            if self.robots is not None and not self.robots.can_fetch(url):
+                continue
+            budgets[site] += 1
+            pages.append((url, site, depth))
+        return pages
+
+    def _host_slot(self, url: str) -> threading.Semaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.Semaphore(self.host_concurrency)
+        return slot
+
+    def _fetch(self, url: str, site: str, depth: int, use_cache: bool,
+               on_result: Optional[Callable[[Dict[str, Any]], None]],
+               cancel: Optional[threading.Event]) -> Dict[str, Any]:
+        with self._host_slot(url):
+            if cancel is not None and cancel.is_set():
+                result = {"url": url, "timestamp": datetime.now().isoformat(), "success": False,
+                          "cancelled": True, "error": "Cancelled", "data": {}}
+            elif self.robots is not None and depth == 0 and not self.robots.can_fetch(url):
+                result = {"url": url, "timestamp": datetime.now().isoformat(), "success": False,
+                          "error": "Disallowed by robots.txt", "data": {}}
+            else:
+                self.throttle.wait(url, self.robots.crawl_delay(url) if self.robots is not None else None)
+                result = self.service.parse_url(url, use_cache=use_cache)
+        result["crawl"] = {"site": site, "depth": depth}
+        if on_result is not None and not result.get("cancelled"):
+            on_result(result)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl competitor sites and print a summary of every page")
+    parser.add_argument("urls", nargs="*", help="Start URLs (default: COMPETITOR_URLS)")
+    parser.add_argument("--depth", type=int, default=CRAWL_MAX_DEPTH, help="Link hops from the start page")
+    parser.add_argument("--pages", type=int, default=CRAWL_MAX_PAGES, help="Page budget per site")
+    parser.add_argument("--ignore-robots", action="store_true", help="Do not read robots.txt")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the page cache")
+    args = parser.parse_args()
+
+    crawler = Crawler(max_depth=args.depth, max_pages=args.pages, respect_robots=not args.ignore_robots)
+    results = crawler.crawl(args.urls or None, use_cache=not args.no_cache)
+    summary = [{"url": result["url"], "depth": result["crawl"]["depth"], "success": result.get("success"),
+                "title": (result.get("data") or {}).get("title"), "error": result.get("error")}
+               for result in results]
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
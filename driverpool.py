@@ -0,0 +1,247 @@
+"""Process-wide pool of warm Chrome WebDriver instances"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+from webdriver_manager.chrome import ChromeDriverManager
+from metrics import PARSER_STAGE_SECONDS
+from config import (
+    SELENIUM_HEADLESS, SELENIUM_TIMEOUT, SELENIUM_POOL_SIZE,
+    SELENIUM_MAX_PAGES_PER_DRIVER, SELENIUM_LEASE_TIMEOUT, SELENIUM_LEASE_ATTEMPTS, USER_AGENT,
+    FETCH_PROFILES, FETCH_PROFILE, BLOCKED_RESOURCE_PATTERNS
+)
+
+_chromedriver_path: Optional[str] = None
+_chromedriver_lock = threading.Lock()
+
+
+def get_chromedriver_path() -> str:
+    """Resolve the chromedriver binary once per process"""
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path is None:
+            _chromedriver_path = ChromeDriverManager().install()
+        return _chromedriver_path
+
+
+def get_fetch_profile(name: str) -> Dict[str, Any]:
+    """Settings of a fetch profile from FETCH_PROFILES"""
+    if name not in FETCH_PROFILES:
+        raise ValueError(f"Unknown fetch profile: {name}")
+    return FETCH_PROFILES[name]
+
+
+def blocked_url_patterns(profile: Dict[str, Any]) -> List[str]:
+    """URL patterns of every resource category the profile blocks"""
+    return [pattern for category in profile.get("block", []) for pattern in BLOCKED_RESOURCE_PATTERNS[category]]
+
+
+def create_driver(profile: str = FETCH_PROFILE) -> webdriver.Chrome:
+    """Launch a new headless Chrome instance configured for a fetch profile"""
+    settings = get_fetch_profile(profile)
+    chrome_options = Options()
+    if SELENIUM_HEADLESS:
+        chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument(f"--user-agent={USER_AGENT}")
+    chrome_options.page_load_strategy = settings.get("page_load_strategy", "normal")
+    if "images" in settings.get("block", []):
+        # Content setting as well as the URL patterns: catches images without a file extension
+        chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    # Network events are read back from the performance log to report transferred bytes
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    service = Service(get_chromedriver_path())
+    with PARSER_STAGE_SECONDS.labels("driver_startup").time():
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+    driver.set_page_load_timeout(SELENIUM_TIMEOUT)
+    patterns = blocked_url_patterns(settings)
+    if patterns:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    return driver
+
+
+def drain_network_log(driver: webdriver.Chrome) -> Dict[str, int]:
+    """
+    Bytes transferred, responses and blocked requests since the previous
+    call, from the performance log (reading the log clears it)
+    """
+    stats = {"bytes": 0, "requests": 0, "blocked": 0}
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        return stats
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        method = message.get("method")
+        if method == "Network.loadingFinished":
+            stats["bytes"] += int(message["params"].get("encodedDataLength", 0))
+            stats["requests"] += 1
+        elif method == "Network.loadingFailed" and message["params"].get("blockedReason"):
+            stats["blocked"] += 1
+    return stats
+
+
+class PooledDriver:
+    """A WebDriver checked out of the pool together with its usage counter"""
+
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.pages = 0
+        self.broken = False
+
+    def mark_broken(self):
+        """Flag the driver so the pool discards it instead of reusing it"""
+        self.broken = True
+
+
+class DriverPool:
+    """
+    Bounded pool of Chrome drivers, all launched with the same fetch profile.
+
+    Drivers are handed out through lease(), health-checked before reuse and
+    recycled after max_pages page loads or when a lease marks them broken.
+    """
+
+    def __init__(self, size: int = SELENIUM_POOL_SIZE,
+                 max_pages: int = SELENIUM_MAX_PAGES_PER_DRIVER, profile: str = FETCH_PROFILE):
+        get_fetch_profile(profile)
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.profile = profile
+        self._idle: List[PooledDriver] = []
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def start(self, warm: Optional[int] = None):
+        """Resolve chromedriver and pre-launch up to `warm` drivers"""
+        with self._cond:
+            self._closed = False
+        get_chromedriver_path()
+        for _ in range(self.size if warm is None else min(warm, self.size)):
+            with self._cond:
+                if self._created >= self.size:
+                    break
+                self._created += 1
+            try:
+                pooled = PooledDriver(create_driver(self.profile))
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                raise
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+    def _acquire(self, timeout: float) -> PooledDriver:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Driver pool is shut down")
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.size:
+                    self._created += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a free WebDriver")
+                self._cond.wait(remaining)
+        try:
+            return PooledDriver(create_driver(self.profile))
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, pooled: PooledDriver):
+        recycle = pooled.broken or (self.max_pages and pooled.pages >= self.max_pages)
+        with self._cond:
+            if not recycle and not self._closed:
+                self._idle.append(pooled)
+                self._cond.notify()
+                return
+            self._created -= 1
+            self._cond.notify()
+        _quit(pooled.driver)
+
+    @staticmethod
+    def _is_healthy(pooled: PooledDriver) -> bool:
+        try:
+            pooled.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    @contextmanager
+    def lease(self, timeout: float = SELENIUM_LEASE_TIMEOUT) -> Iterator[PooledDriver]:
+        """
+        Check a healthy driver out of the pool for the duration of the block.
+        Call mark_broken() on the lease if the driver crashed while in use.
+        Gives up after SELENIUM_LEASE_ATTEMPTS drivers in a row fail the health check.
+        """
+        pooled = self._acquire(timeout)
+        attempts = 1
+        while not self._is_healthy(pooled):
+            pooled.mark_broken()
+            self._release(pooled)
+            if attempts >= SELENIUM_LEASE_ATTEMPTS:
+                raise WebDriverException(f"No healthy WebDriver after {attempts} attempts")
+            attempts += 1
+            pooled = self._acquire(timeout)
+        try:
+            yield pooled
+        finally:
+            self._release(pooled)
+
+    def shutdown(self):
+        """Quit all idle drivers; leased drivers are quit when returned"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            _quit(pooled.driver)
+
+
+def _quit(driver: webdriver.Chrome):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+_pools: Dict[str, DriverPool] = {}
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool(profile: Optional[str] = None) -> DriverPool:
+    """Get or create the process-wide driver pool of a fetch profile (default: FETCH_PROFILE)"""
+    profile = profile or FETCH_PROFILE
+    with _pool_lock:
+        pool = _pools.get(profile)
+        if pool is None:
+            pool = _pools[profile] = DriverPool(profile=profile)
+        return pool
+
+
+def shutdown_driver_pool():
+    """Shut down all process-wide driver pools that were created"""
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
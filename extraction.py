@@ -0,0 +1,348 @@
+"""Single-pass HTML extraction of the page data collected by ParsingService"""
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+from config import PAGE_TEXT_LIMIT, PAGE_LINK_LIMIT
+
+TEXT_LIMIT = PAGE_TEXT_LIMIT  # Characters of main/body text
+LINK_LIMIT = PAGE_LINK_LIMIT
+LINK_TEXT_LIMIT = 100
+IMAGE_LIMIT = 20
+
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+
+# Page text keeps block boundaries, so long text can be chunked on its structure:
+# a blank line starts the section of every heading, a line break surrounds other blocks
+BLOCK_TAGS = frozenset((
+    "address", "article", "aside", "blockquote", "br", "dd", "details", "dialog", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "header", "hr", "li", "main", "nav", "ol",
+    "p", "pre", "section", "summary", "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul"
+))
+LINE_BREAK = "\n"
+SECTION_BREAK = "\n\n"
+
+# Elements whose text never shows up in get_text() of their ancestors (ruby annotations included)
+_SKIPPED_TEXT_TAGS = frozenset(("script", "style", "template", "rt", "rp"))
+_VOID_TAGS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen",
+    "link", "menuitem", "meta", "param", "source", "track", "wbr", "basefont",
+    "bgsound", "command", "frame", "image", "isindex", "nextid", "spacer"
+))
+
+
+def _block_breaks(tag: str) -> Tuple[str, str]:
+    """Separators an element puts before and after its text"""
+    if tag in HEADING_TAGS:
+        return SECTION_BREAK, LINE_BREAK
+    if tag in BLOCK_TAGS:
+        return LINE_BREAK, LINE_BREAK
+    return "", ""
+
+
+class _TextRegion:
+    """
+    Stripped text of one element capped at `limit`, joined with spaces, or
+    with the strongest block break seen between two pieces
+    """
+
+    def __init__(self, depth: int, limit: int):
+        self.depth = depth
+        self.limit = limit
+        self.parts: List[str] = []
+        self.length = 0
+        self.pending = ""
+        self.open = True
+
+    def block_break(self, separator: str):
+        if len(separator) > len(self.pending):
+            self.pending = separator
+
+    def add(self, text: str):
+        if self.length >= self.limit:
+            return
+        text = text.strip()
+        if text:
+            if self.parts:
+                text = (self.pending or " ") + text
+            self.pending = ""
+            self.parts.append(text)
+            self.length += len(text)
+
+    def value(self) -> str:
+        return "".join(self.parts)[:self.limit]
+
+
+class _Capture:
+    """Raw text of an element still open on the stack, like Tag.get_text()"""
+
+    __slots__ = ("depth", "kind", "order", "attr", "parts")
+
+    def __init__(self, depth: int, kind: str, order: int, attr: Optional[str] = None):
+        self.depth = depth
+        self.kind = kind
+        self.order = order
+        self.attr = attr
+        self.parts: List[str] = []
+
+
+class PageExtractor(HTMLParser):
+    """
+    Event-driven extractor that fills the ParsingService `data` dict in a
+    single pass over the markup. Tree semantics follow BeautifulSoup's
+    html.parser builder: end tags close the most recent matching element,
+    void elements close immediately and stray end tags are ignored.
+    """
+
+    def __init__(self, text_limit: int = TEXT_LIMIT, link_limit: int = LINK_LIMIT,
+                 image_limit: int = IMAGE_LIMIT):
+        super().__init__(convert_charrefs=True)
+        self.text_limit = text_limit
+        self.link_limit = link_limit
+        self.image_limit = image_limit
+
+        self._stack: List[str] = []
+        self._skip_depth = 0
+        self._pending: List[str] = []
+        self._captures: List[_Capture] = []
+        self._order = 0
+
+        self._title: Optional[str] = None
+        self._title_seen = False
+        self._meta: Dict[str, str] = {}
+        self._headings: Dict[str, List[Tuple[int, str]]] = {tag: [] for tag in HEADING_TAGS}
+        self._links: List[Tuple[int, Dict[str, str]]] = []
+        self._images: List[Dict[str, str]] = []
+        self._body: Optional[_TextRegion] = None
+        self._main: Optional[_TextRegion] = None
+
+    # Tree events
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        self._open(tag, attrs)
+        if tag in _VOID_TAGS:
+            self._close(len(self._stack) - 1)
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+        self._open(tag, attrs)
+        self._close(len(self._stack) - 1)
+
+    def handle_endtag(self, tag):
+        self._flush()
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index] == tag:
+                self._close(index)
+                break
+
+    def handle_data(self, data):
+        self._pending.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        if data.startswith("CDATA["):
+            # BeautifulSoup keeps CDATA sections as text nodes of their own
+            self._pending.append(data[len("CDATA["):])
+            self._flush()
+
+    def close(self):
+        super().close()
+        self._flush()
+        self._close(0)
+
+    # Internals
+
+    def _open(self, tag: str, attrs):
+        depth = len(self._stack)
+        self._stack.append(tag)
+        self._block_break(_block_breaks(tag)[0])
+        if tag in _SKIPPED_TEXT_TAGS:
+            self._skip_depth += 1
+        attributes = {name: value or "" for name, value in attrs}
+
+        if tag == "title" and not self._title_seen:
+            self._title_seen = True
+            self._captures.append(_Capture(depth, "title", 0))
+        elif tag in HEADING_TAGS:
+            self._captures.append(_Capture(depth, tag, self._next_order()))
+        elif tag == "a":
+            href = attributes.get("href")
+            if href and len(self._links) < self.link_limit:
+                self._captures.append(_Capture(depth, "a", self._next_order(), href))
+        elif tag == "img":
+            src = attributes.get("src")
+            if src and len(self._images) < self.image_limit:
+                self._images.append({"src": src, "alt": attributes.get("alt", "")})
+        elif tag == "meta":
+            name = attributes.get("name")
+            if name in ("description", "keywords") and name not in self._meta:
+                self._meta[name] = attributes.get("content", "")
+        elif tag == "body" and self._body is None:
+            self._body = _TextRegion(depth, self.text_limit)
+        elif tag == "main" and self._main is None:
+            self._main = _TextRegion(depth, self.text_limit)
+
+    def _close(self, index: int):
+        """Pop the element at `index` and everything opened inside it"""
+        for tag in self._stack[index:]:
+            if tag in _SKIPPED_TEXT_TAGS:
+                self._skip_depth -= 1
+            self._block_break(_block_breaks(tag)[1])
+        del self._stack[index:]
+
+        while self._captures and self._captures[-1].depth >= index:
+            self._finish(self._captures.pop())
+        for region in (self._body, self._main):
+            if region is not None and region.open and region.depth >= index:
+                region.open = False
+
+    def _block_break(self, separator: str):
+        if separator:
+            for region in (self._body, self._main):
+                if region is not None and region.open:
+                    region.block_break(separator)
+
+    def _finish(self, capture: _Capture):
+        text = "".join(capture.parts).strip()
+        if capture.kind == "title":
+            self._title = text
+        elif capture.kind == "a":
+            if text:
+                self._links.append((capture.order, {"url": capture.attr, "text": text[:LINK_TEXT_LIMIT]}))
+        else:
+            self._headings[capture.kind].append((capture.order, text))
+
+    def _flush(self):
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending = []
+        if self._skip_depth:
+            return
+        for capture in self._captures:
+            capture.parts.append(text)
+        for region in (self._body, self._main):
+            if region is not None and region.open:
+                region.add(text)
+
+    def _next_order(self) -> int:
+        self._order += 1
+        return self._order
+
+    def result(self) -> Dict[str, Any]:
+        """Build the data dict; call after close()"""
+        data: Dict[str, Any] = {
+            "title": self._title if self._title is not None else "No title",
+            "meta_description": self._meta.get("description", ""),
+            "headings": {tag: [text for _, text in sorted(items, key=lambda item: item[0])]
+                         for tag, items in self._headings.items()},
+        }
+        region = self._main or self._body
+        if region is not None:
+            data["text_content"] = region.value()
+        self._links.sort(key=lambda item: item[0])
+        data["links"] = [link for _, link in self._links[:self.link_limit]]
+        data["images"] = self._images
+        if "keywords" in self._meta:
+            data["keywords"] = [k.strip() for k in self._meta["keywords"].split(",")]
+        return data
+
+
+def extract_page_data(page_source: str) -> Dict[str, Any]:
+    """Extract title, meta, headings, text, links, images and keywords from HTML"""
+    extractor = PageExtractor()
+    extractor.feed(page_source)
+    extractor.close()
+    return extractor.result()
+
+
+def _block_text(root: Tag) -> str:
+    """get_text(separator=' ', strip=True) with block boundaries kept as line breaks"""
+    parts: List[str] = []
+    pending = ""
+
+    def walk(element: Tag):
+        nonlocal pending
+        for child in element.children:
+            if isinstance(child, Tag):
+                before, after = _block_breaks(child.name)
+                if len(before) > len(pending):
+                    pending = before
+                walk(child)
+                if len(after) > len(pending):
+                    pending = after
+            elif type(child) in (NavigableString, CData):  # What get_text() includes
+                text = child.strip()
+                if text:
+                    parts.append((pending or " ") + text if parts else text)
+                    pending = ""
+
+    walk(root)
+    return "".join(parts)
+
+
+def extract_page_data_bs4(page_source: str) -> Dict[str, Any]:
+    """
+    Original multi-pass BeautifulSoup extraction. Kept as the reference
+    implementation for equivalence checks and benchmarks/bench_extraction.py.
+    """
+    data: Dict[str, Any] = {}
+    soup = BeautifulSoup(page_source, 'html.parser')
+
+    # Extract key information
+    title = soup.find('title')
+    data["title"] = title.get_text().strip() if title else "No title"
+
+    # Extract meta description
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    data["meta_description"] = meta_desc.get('content', '') if meta_desc else ""
+
+    # Extract headings
+    headings = {}
+    for i in range(1, 7):
+        h_tags = soup.find_all(f'h{i}')
+        headings[f'h{i}'] = [h.get_text().strip() for h in h_tags]
+    data["headings"] = headings
+
+    # Extract main text content
+    main_content = soup.find('main') or soup.find('body')
+    if main_content:
+        # Remove script and style elements
+        for script in main_content(["script", "style"]):
+            script.decompose()
+        data["text_content"] = _block_text(main_content)[:TEXT_LIMIT]
+
+    # Extract links
+    links = []
+    for link in soup.find_all('a', href=True):
+        href = link.get('href')
+        text = link.get_text().strip()
+        if href and text:
+            links.append({"url": href, "text": text[:LINK_TEXT_LIMIT]})
+    data["links"] = links[:LINK_LIMIT]
+
+    # Extract images
+    images = []
+    for img in soup.find_all('img', src=True):
+        src = img.get('src')
+        alt = img.get('alt', '')
+        if src:
+            images.append({"src": src, "alt": alt})
+    data["images"] = images[:IMAGE_LIMIT]
+
+    # Extract meta keywords
+    meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
+    if meta_keywords:
+        keywords = meta_keywords.get('content', '').split(',')
+        data["keywords"] = [k.strip() for k in keywords]
+
+    return data
@@ -0,0 +1,321 @@
+"""
+Local stand-in for the OpenAI API, for offline development and testing.
+
+Usage:
+    python fake_openai_server.py [--port 8100] [--latency 0.5] [--rpm 60]
+
+Then point the app at it through .env:
+    PROXY_API_KEY=test
+    PROXY_API_URL=http://127.0.0.1:8100/v1
+
+Implements chat completions (text and image prompts get a canned analysis in
+the requested JSON shape, streamed as SSE chunks with "stream": true), file upload/download and the Batch API, which runs
+submitted job files in the background. With --rpm, completions carry
+x-ratelimit-* headers and requests over the per-minute limit get a 429.
+"""
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _canned_analysis(prompt: str) -> Dict[str, Any]:
+    """Deterministic analysis in the shape the prompt asks for"""
+    seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    analysis = {
+        "design_score": seed % 11,
+        "animation_potential": (seed // 11) % 11,
+        "strengths": ["Clear value proposition", "Consistent visual hierarchy"],
+        "weaknesses": ["Generic stock imagery", "Weak call to action"],
+        "recommendations": ["Add customer proof points", "Tighten the hero copy"],
+        "overall_impression": "Solid, conventional presentation with room for differentiation.",
+        "competitive_positioning": "Mid-market, competing on ease of use.",
+    }
+    if "visual content" in prompt:
+        analysis.update(color_scheme="Blue and white with orange accents",
+                        typography="Geometric sans-serif headings, humanist body text",
+                        brand_identity="Friendly and professional",
+                        visual_consistency="Consistent across sections")
+    else:
+        analysis.update(tone="Confident and approachable", brand_voice="Plain-spoken expert",
+                        key_messaging=["Save time", "Grow revenue"],
+                        value_propositions=["All-in-one platform", "Fast onboarding"],
+                        seo_keywords=["analytics", "dashboard", "free trial"],
+                        cta_effectiveness="Visible but generic")
+    return analysis
+
+
+def _prompt_text(body: Dict[str, Any]) -> str:
+    parts = []
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(part.get("text", "") for part in content if part.get("type") == "text")
+    return "\n".join(parts)
+
+
+def chat_completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a chat.completion response for a request body"""
+    prompt = _prompt_text(body)
+    content = json.dumps(_canned_analysis(prompt))
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = max(1, len(content) // 4)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def chat_completion_chunks(body: Dict[str, Any], size: int = 8):
+    """chat.completion.chunk objects streaming the same content as chat_completion()"""
+    completion = chat_completion(body)
+    content = completion["choices"][0]["message"]["content"]
+    base = {"id": completion["id"], "object": "chat.completion.chunk",
+            "created": completion["created"], "model": completion["model"]}
+    yield dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+    for start in range(0, len(content), size):
+        yield dict(base, choices=[{"index": 0, "delta": {"content": content[start:start + size]},
+                                   "finish_reason": None}])
+    yield dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+
+
+class FakeOpenAI:
+    """In-memory state of files and batches"""
+
+    def __init__(self, latency: float = 0.0, stream_delay: float = 0.01, rpm: Optional[int] = None):
+        self.latency = latency
+        self.stream_delay = stream_delay  # Seconds between streamed chunks
+        self.rpm = rpm  # Requests per minute before 429s; None: unlimited
+        self.request_times: List[float] = []
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def rate_limit(self) -> Tuple[bool, Dict[str, str]]:
+        """Count a completion request in the sliding minute; returns (allowed, x-ratelimit headers)"""
+        if not self.rpm:
+            return True, {}
+        with self.lock:
+            now = time.monotonic()
+            self.request_times = [t for t in self.request_times if now - t < 60]
+            allowed = len(self.request_times) < self.rpm
+            if allowed:
+                self.request_times.append(now)
+            reset = 60 - (now - self.request_times[0]) if self.request_times else 0
+        headers = {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(self.rpm - len(self.request_times)),
+            "x-ratelimit-reset-requests": f"{reset:.3f}s"
+        }
+        if not allowed:
+            headers["retry-after-ms"] = str(int(reset * 1000))
+        return allowed, headers
+
+    def add_file(self, filename: str, purpose: str, data: bytes) -> Dict[str, Any]:
+        file_object = {
+            "id": f"file-{uuid.uuid4().hex[:24]}",
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self.lock:
+            self.files[file_object["id"]] = dict(file_object, data=data)
+        return file_object
+
+    def create_batch(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        now = int(time.time())
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex[:24]}",
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "errors": None,
+            "input_file_id": body["input_file_id"],
+            "completion_window": body.get("completion_window", "24h"),
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": now,
+            "expires_at": now + 24 * 3600,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": body.get("metadata"),
+        }
+        with self.lock:
+            self.batches[batch["id"]] = batch
+        threading.Thread(target=self._run_batch, args=(batch["id"],), daemon=True).start()
+        return batch
+
+    def _run_batch(self, batch_id: str):
+        batch = self.batches[batch_id]
+        lines = self.files[batch["input_file_id"]]["data"].decode("utf-8").splitlines()
+        requests = [json.loads(line) for line in lines if line.strip()]
+        batch.update(status="in_progress", in_progress_at=int(time.time()))
+        batch["request_counts"]["total"] = len(requests)
+
+        outputs = []
+        for request in requests:
+            time.sleep(self.latency)
+            outputs.append({
+                "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex,
+                             "body": chat_completion(request["body"])},
+                "error": None,
+            })
+            batch["request_counts"]["completed"] += 1
+
+        data = "".join(json.dumps(line) + "\n" for line in outputs).encode("utf-8")
+        output_file = self.add_file(f"{batch_id}_output.jsonl", "batch_output", data)
+        batch.update(status="completed", output_file_id=output_file["id"],
+                     completed_at=int(time.time()))
+
+
+def _parse_multipart(content_type: str, body: bytes) -> Tuple[Dict[str, str], Optional[Tuple[str, bytes]]]:
+    """Return (form fields, (filename, data) of the uploaded file)"""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+    )
+    fields, upload = {}, None
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        filename = part.get_filename()
+        payload = part.get_payload(decode=True) or b""
+        if filename is not None:
+            upload = (filename, payload)
+        elif name:
+            fields[name] = payload.decode("utf-8")
+    return fields, upload
+
+
+def make_handler(state: FakeOpenAI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _path(self) -> str:
+            path = self.path.split("?", 1)[0]
+            return path[len("/v1"):] if path.startswith("/v1/") else path
+
+        def _body(self) -> bytes:
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _send_json(self, payload: Any, status: int = 200, headers: Optional[Dict[str, str]] = None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, request: Dict[str, Any], headers: Dict[str, str]):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            for chunk in chat_completion_chunks(request):
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(state.stream_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+        def _not_found(self):
+            self._send_json({"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}}, 404)
+
+        def do_POST(self):
+            path = self._path()
+            body = self._body()
+            if path == "/chat/completions":
+                allowed, headers = state.rate_limit()
+                if not allowed:
+                    self._send_json({"error": {"message": "Rate limit reached for requests", "type": "requests",
+                                               "code": "rate_limit_exceeded"}}, 429, headers)
+                    return
+                time.sleep(state.latency)
+                request = json.loads(body)
+                if request.get("stream"):
+                    self._send_stream(request, headers)
+                else:
+                    self._send_json(chat_completion(request), headers=headers)
+            elif path == "/files":
+                fields, upload = _parse_multipart(self.headers["Content-Type"], body)
+                if upload is None:
+                    self._send_json({"error": {"message": "file is required"}}, 400)
+                    return
+                self._send_json(state.add_file(upload[0], fields.get("purpose", "batch"), upload[1]))
+            elif path == "/batches":
+                self._send_json(state.create_batch(json.loads(body)))
+            else:
+                self._not_found()
+
+        def do_GET(self):
+            parts = self._path().strip("/").split("/")
+            if len(parts) == 2 and parts[0] == "batches" and parts[1] in state.batches:
+                self._send_json(state.batches[parts[1]])
+            elif len(parts) == 3 and parts[0] == "files" and parts[2] == "content" and parts[1] in state.files:
+                data = state.files[parts[1]]["data"]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            elif len(parts) == 2 and parts[0] == "files" and parts[1] in state.files:
+                self._send_json({k: v for k, v in state.files[parts[1]].items() if k != "data"})
+            else:
+                self._not_found()
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8100, latency: float = 0.0,
+          rpm: Optional[int] = None) -> ThreadingHTTPServer:
+    """Create the server; call serve_forever() on it (or run it in a thread)"""
+    server = ThreadingHTTPServer((host, port), make_handler(FakeOpenAI(latency, rpm=rpm)))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every completion")
+    parser.add_argument("--rpm", type=int, help="Completions per minute before answering 429")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.latency, args.rpm)
+    print(f"Fake OpenAI API on http://{args.host}:{args.port}/v1 (latency {args.latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,12 @@
 """Main window for Competitor Analyzer desktop application"""
 import sys
-import os
 import json
 import requests
 from datetime import datetime
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
     QTextEdit, QLabel, QFileDialog, QTabWidget, QTableWidget,
-    QTableWidgetItem, QHeaderView, QMessageBox, QProgressBar
+    QTableWidgetItem, QHeaderView, QMessageBox, QProgressBar, QLineEdit
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QFont, QPixmap, QImage
@@ -18,6 +17,7 @@ class AnalysisThread(QThread):
     """Thread for running analysis in background"""
     finished = pyqtSignal(dict)
     error = pyqtSignal(str)
+    partial = pyqtSignal(str, object)  # Field name and value of a streamed text analysis
     
     def __init__(self, analysis_type, data):
         super().__init__()
@@ -36,28 +36,58 @@ class AnalysisThread(QThread):
                     self.finished.emit(response.json())
             
             elif self.analysis_type == "text":
-                response = requests.post(
-                    f"{base_url}/analyzetext",
-                    json={"text": self.data}
-                )
-                response.raise_for_status()
-                self.finished.emit(response.json())
+                # Server-Sent Events: fields are shown as soon as the model completes them
+                with requests.post(f"{base_url}/analyzetext/stream", json={"text": self.data},
+                                   stream=True) as response:
+                    response.raise_for_status()
+                    event = None
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line.startswith("event:"):
+                            event = line[len("event:"):].strip()
+                        elif line.startswith("data:"):
+                            data = json.loads(line[len("data:"):])
+                            if event == "field":
+                                self.partial.emit(data["name"], data["value"])
+                            elif event == "done":
+                                self.finished.emit(data)
+                                return
+                raise RuntimeError("Analysis stream ended without a result")
             
         except Exception as e:
             self.error.emit(str(e))
 
 
 class ParsingThread(QThread):
-    """Thread for parsing competitor sites"""
+    """Thread for parsing competitor sites through a background job"""
     finished = pyqtSignal(dict)
     error = pyqtSignal(str)
+    progress = pyqtSignal(int, int)  # Sites done, total
+    
+    POLL_INTERVAL_MS = 1000
     
     def run(self):
         try:
             base_url = f"http://{API_HOST}:{API_PORT}"
-            response = requests.get(f"{base_url}/parsedemo")
+            response = requests.post(f"{base_url}/jobs/parse", json={}, timeout=30)
             response.raise_for_status()
-            self.finished.emit(response.json())
+            job = response.json()["job"]
+            
+            # Poll the job instead of holding one request open for the whole parse
+            while job["status"] not in ("completed", "cancelled", "failed"):
+                self.progress.emit(job["done"], job["total"])
+                self.msleep(self.POLL_INTERVAL_MS)
+                response = requests.get(f"{base_url}/jobs/{job['id']}", timeout=30)
+                response.raise_for_status()
+                job = response.json()["job"]
+            
+            if job["status"] == "failed":
+                raise RuntimeError(job.get("error") or "Parse job failed")
+            self.progress.emit(job["done"], job["total"])
+            self.finished.emit({
+                "success": True,
+                "results": [result for result in job["results"] if result is not None],
+                "run_id": job.get("run_id")
+            })
         except Exception as e:
             self.error.emit(str(e))
 
@@ -222,16 +252,35 @@ class CompetitorAnalyzerWindow(QMainWindow):
         refresh_btn.clicked.connect(self.load_history)
         layout.addWidget(refresh_btn)
         
+        # Full-text search
+        search_layout = QHBoxLayout()
+        self.history_search_input = QLineEdit()
+        self.history_search_input.setPlaceholderText('Search strengths, weaknesses, keywords, headings... ("quotes" for a phrase)')
+        self.history_search_input.returnPressed.connect(self.search_history)
+        search_layout.addWidget(self.history_search_input)
+        search_btn = QPushButton("Search")
+        search_btn.clicked.connect(self.search_history)
+        search_layout.addWidget(search_btn)
+        layout.addLayout(search_layout)
+        
         # History table
         self.history_table = QTableWidget()
-        self.history_table.setColumnCount(3)
-        self.history_table.setHorizontalHeaderLabels(["Filename", "Type", "Timestamp"])
+        self.history_table.setColumnCount(5)
+        self.history_table.setHorizontalHeaderLabels(["ID", "Type", "Reference", "Timestamp", "Match"])
         self.history_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.history_table.itemDoubleClicked.connect(self.view_history_item)
         layout.addWidget(self.history_table)
         
+        # Next page of older records
+        self.history_more_btn = QPushButton("Load More")
+        self.history_more_btn.clicked.connect(lambda: self.load_history(more=True))
+        self.history_more_btn.setEnabled(False)
+        layout.addWidget(self.history_more_btn)
+        
         tab.setLayout(layout)
         self.tabs.addTab(tab, "History")
+        
+        self.history_cursor = None
     
     def select_image(self):
         """Select image file"""
@@ -305,7 +354,10 @@ Overall Impression:
         self.text_progress.setRange(0, 0)
         self.statusBar().showMessage("Analyzing text...")
         
+        self.partial_text_analysis = {}
+        self.text_results.clear()
         self.text_analysis_thread = AnalysisThread("text", text)
+        self.text_analysis_thread.partial.connect(self.on_text_analysis_partial)
         self.text_analysis_thread.finished.connect(self.on_text_analysis_finished)
         self.text_analysis_thread.error.connect(self.on_analysis_error)
         self.text_analysis_thread.start()
@@ -316,13 +368,24 @@ Overall Impression:
         self.statusBar().showMessage("Analysis complete")
         
         if result.get("success") and result.get("analysis"):
-            analysis = result["analysis"]
-            formatted_result = f"""
-Design Score: {analysis.get('design_score', 'N/A')}/10
-Animation Potential: {analysis.get('animation_potential', 'N/A')}/10
+            self.text_results.setText(self.format_text_analysis(result["analysis"]))
+        else:
+            self.text_results.setText(f"Error: {result.get('error', 'Unknown error')}")
+    
+    def on_text_analysis_partial(self, name, value):
+        """Show the fields of a text analysis received so far"""
+        self.partial_text_analysis[name] = value
+        self.statusBar().showMessage("Receiving analysis...")
+        self.text_results.setText(self.format_text_analysis(self.partial_text_analysis, missing="..."))
+    
+    def format_text_analysis(self, analysis, missing="N/A"):
+        """Render a text analysis; `missing` stands in for fields not available (yet)"""
+        return f"""
+Design Score: {analysis.get('design_score', missing)}/10
+Animation Potential: {analysis.get('animation_potential', missing)}/10
 
-Tone: {analysis.get('tone', 'N/A')}
-Brand Voice: {analysis.get('brand_voice', 'N/A')}
+Tone: {analysis.get('tone', missing)}
+Brand Voice: {analysis.get('brand_voice', missing)}
 
 Key Messaging:
 {chr(10).join('- ' + m for m in analysis.get('key_messaging', []))}
@@ -343,11 +406,8 @@ Recommendations:
 {chr(10).join('- ' + r for r in analysis.get('recommendations', []))}
 
 Overall Impression:
-{analysis.get('overall_impression', 'N/A')}
+{analysis.get('overall_impression', missing)}
 """
-            self.text_results.setText(formatted_result)
-        else:
-            self.text_results.setText(f"Error: {result.get('error', 'Unknown error')}")
     
     def parse_competitors(self):
         """Parse competitor websites"""
@@ -356,10 +416,18 @@ Overall Impression:
         self.statusBar().showMessage("Parsing competitor websites...")
         
         self.parse_thread = ParsingThread()
+        self.parse_thread.progress.connect(self.on_parse_progress)
         self.parse_thread.finished.connect(self.on_parse_finished)
         self.parse_thread.error.connect(self.on_analysis_error)
         self.parse_thread.start()
     
+    def on_parse_progress(self, done, total):
+        """Show how many sites of the parse job are done"""
+        if total:
+            self.parse_progress.setRange(0, total)
+            self.parse_progress.setValue(done)
+            self.statusBar().showMessage(f"Parsing competitor websites... {done}/{total}")
+    
     def on_parse_finished(self, result):
         """Handle parsing completion"""
         self.parse_progress.setVisible(False)
@@ -377,40 +445,72 @@ Overall Impression:
                 self.parse_results_table.setItem(i, 2, QTableWidgetItem(title))
                 self.parse_results_table.setItem(i, 3, QTableWidgetItem(item.get("timestamp", "N/A")))
     
-    def load_history(self):
-        """Load analysis history"""
+    def load_history(self, more=False):
+        """Load analysis history, one page at a time"""
         try:
             base_url = f"http://{API_HOST}:{API_PORT}"
-            response = requests.get(f"{base_url}/history")
+            params = {"limit": 100}
+            if more and self.history_cursor:
+                params["cursor"] = self.history_cursor
+            response = requests.get(f"{base_url}/history", params=params)
             response.raise_for_status()
             data = response.json()
             
-            if data.get("success") and data.get("files"):
-                files = data["files"]
-                self.history_table.setRowCount(len(files))
-                
-                for i, file_info in enumerate(files):
-                    filename = file_info["filename"]
-                    # Determine type from filename
-                    file_type = "Analysis" if "analysis" in filename else "Parsing"
-                    
-                    self.history_table.setItem(i, 0, QTableWidgetItem(filename))
-                    self.history_table.setItem(i, 1, QTableWidgetItem(file_type))
-                    self.history_table.setItem(i, 2, QTableWidgetItem(file_info["modified"]))
+            if not more:
+                self.history_table.setRowCount(0)
+            for record in data.get("items", []):
+                row = self.history_table.rowCount()
+                self.history_table.insertRow(row)
+                self.history_table.setItem(row, 0, QTableWidgetItem(str(record["id"])))
+                self.history_table.setItem(row, 1, QTableWidgetItem(record["type"]))
+                self.history_table.setItem(row, 2, QTableWidgetItem(record.get("ref") or ""))
+                self.history_table.setItem(row, 3, QTableWidgetItem(record["timestamp"]))
+            
+            self.history_cursor = data.get("next_cursor")
+            self.history_more_btn.setEnabled(self.history_cursor is not None)
         
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load history: {str(e)}")
     
+    def search_history(self):
+        """Show history records matching the search box, best match first"""
+        query = self.history_search_input.text().strip()
+        if not query:
+            self.load_history()
+            return
+        
+        try:
+            base_url = f"http://{API_HOST}:{API_PORT}"
+            response = requests.get(f"{base_url}/history/search", params={"q": query, "limit": 100})
+            response.raise_for_status()
+            results = response.json().get("results", [])
+            
+            self.history_table.setRowCount(len(results))
+            for i, record in enumerate(results):
+                self.history_table.setItem(i, 0, QTableWidgetItem(str(record["id"])))
+                self.history_table.setItem(i, 1, QTableWidgetItem(record["type"]))
+                self.history_table.setItem(i, 2, QTableWidgetItem(record.get("ref") or ""))
+                self.history_table.setItem(i, 3, QTableWidgetItem(record["timestamp"]))
+                self.history_table.setItem(i, 4, QTableWidgetItem(record["snippet"].replace("\n", " ")))
+            
+            # Search results are not paginated by cursor
+            self.history_cursor = None
+            self.history_more_btn.setEnabled(False)
+            self.statusBar().showMessage(f"{len(results)} matching history records")
+        
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Search failed: {str(e)}")
+    
     def view_history_item(self, item):
         """View selected history item"""
         row = item.row()
-        filename = self.history_table.item(row, 0).text()
+        record_id = self.history_table.item(row, 0).text()
         
-        # Read and display file content
         try:
-            file_path = os.path.join("history", filename)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = json.load(f)
+            base_url = f"http://{API_HOST}:{API_PORT}"
+            response = requests.get(f"{base_url}/history/{record_id}")
+            response.raise_for_status()
+            content = response.json()["payload"]
             
             # Display in a new window or dialog
             dialog = QMessageBox(self)
@@ -418,7 +518,7 @@ Overall Impression:
             dialog.setText(json.dumps(content, indent=2, ensure_ascii=False))
             dialog.exec()
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to read file: {str(e)}")
+            QMessageBox.critical(self, "Error", f"Failed to load history item: {str(e)}")
     
     def on_analysis_error(self, error_msg):
         """Handle analysis errors"""
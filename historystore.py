@@ -0,0 +1,333 @@
+"""
+SQLite store for analysis and parsing history.
+
+Usage:
+    python historystore.py [--import-dir history]
+
+Every record keeps its full JSON payload plus indexed columns (type,
+timestamp, ref = URL/filename/text preview, success) used for filtering.
+Listing is keyset-paginated on the record id, so a page costs the same no
+matter how much history has accumulated. Parsing runs are stored as one
+record per URL sharing a run_id. Legacy one-JSON-file-per-event history
+is imported once per file.
+
+A full-text index (SQLite FTS5) over analysis strengths, weaknesses, SEO
+keywords and key messaging and over parsed headings and page text is
+updated in the same transaction as every insert.
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from config import HISTORY_DIR, HISTORY_DB_FILE
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    ref TEXT,
+    success INTEGER,
+    run_id TEXT,
+    source_file TEXT,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_type_id ON history (type, id);
+CREATE INDEX IF NOT EXISTS history_ref_id ON history (ref, id);
+CREATE INDEX IF NOT EXISTS history_run_id ON history (run_id);
+CREATE INDEX IF NOT EXISTS history_source_file ON history (source_file);
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5 (
+    strengths, weaknesses, seo_keywords, key_messaging, headings, text_content,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# Indexed fields of an analysis and their bm25 weights; headings and page text come from parsing results
+SEARCH_FIELDS = ("strengths", "weaknesses", "seo_keywords", "key_messaging", "headings", "text_content")
+_ANALYSIS_FIELDS = SEARCH_FIELDS[:4]
+_SEARCH_WEIGHTS = "2.0, 2.0, 3.0, 2.0, 2.0, 1.0"
+
+_QUERY_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+_SUMMARY_COLUMNS = "id, type, timestamp, ref, success, run_id"
+
+PARSING_TYPE = "parsing"
+MAX_PAGE_SIZE = 500
+
+
+def _describe(entry: Dict[str, Any]):
+    """(ref, success) of a history entry"""
+    ref = entry.get("url") or entry.get("filename") or entry.get("text_preview") or entry.get("batch_id")
+    if isinstance(entry.get("result"), dict):
+        success = entry["result"].get("success")
+    elif "succeeded" in entry and "total" in entry:
+        success = entry["succeeded"] == entry["total"]
+    else:
+        success = entry.get("success")
+    return ref, None if success is None else int(bool(success))
+
+
+def _analyses(entry: Dict[str, Any]):
+    """Analyses contained in a single or batch history entry"""
+    results = [entry.get("result")] + [item.get("result") for item in entry.get("items") or []
+                                       if isinstance(item, dict)]
+    for result in results:
+        if isinstance(result, dict) and isinstance(result.get("analysis"), dict):
+            yield result["analysis"]
+
+
+def _search_document(entry: Dict[str, Any]) -> Optional[List[str]]:
+    """Values of SEARCH_FIELDS for the full-text index, or None when nothing is searchable"""
+    fields = {name: [] for name in SEARCH_FIELDS}
+    for analysis in _analyses(entry):
+        for name in _ANALYSIS_FIELDS:
+            value = analysis.get(name)
+            if isinstance(value, list):
+                fields[name].extend(str(item) for item in value)
+            elif value:
+                fields[name].append(str(value))
+    data = entry.get("data")
+    if isinstance(data, dict):
+        for level in (data.get("headings") or {}).values():
+            fields["headings"].extend(level)
+        if data.get("text_content"):
+            fields["text_content"].append(data["text_content"])
+    document = ["\n".join(fields[name]) for name in SEARCH_FIELDS]
+    return document if any(document) else None
+
+
+def fts_query(query: str, field: Optional[str] = None) -> str:
+    """
+    FTS5 query matching all words of `query` ("quoted text" matches as a
+    phrase), optionally within one of SEARCH_FIELDS. Words are quoted, so
+    FTS syntax in user input is matched literally instead of failing.
+    """
+    terms = []
+    for phrase, word in _QUERY_TERM.findall(query):
+        text = (phrase or word).replace('"', '""')
+        terms.append(f'"{text}"')
+    if not terms:
+        raise ValueError("Empty search query")
+    if field is not None:
+        if field not in SEARCH_FIELDS:
+            raise ValueError(f"Unknown search field: {field}")
+        return f"{field} : ({' '.join(terms)})"
+    return " ".join(terms)
+
+
+def _summary(row: sqlite3.Row) -> Dict[str, Any]:
+    item = dict(row)
+    if item["success"] is not None:
+        item["success"] = bool(item["success"])
+    return item
+
+
+class HistoryStore:
+    """
+    Connections are per thread; WAL mode lets readers run alongside the
+    single writer, and concurrent writers wait on the busy timeout instead
+    of failing.
+    """
+
+    def __init__(self, path: str = HISTORY_DB_FILE):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+            self._index_missing(connection)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _insert(self, connection: sqlite3.Connection, entry: Dict[str, Any], entry_type: str,
+                ref: Optional[str] = None, success: Optional[int] = None, run_id: Optional[str] = None,
+                source_file: Optional[str] = None) -> int:
+        cursor = connection.execute(
+            "INSERT INTO history (type, timestamp, ref, success, run_id, source_file, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (entry_type, entry.get("timestamp") or datetime.now().isoformat(), ref, success, run_id,
+             source_file, json.dumps(entry, ensure_ascii=False))
+        )
+        self._index(connection, cursor.lastrowid, entry)
+        return cursor.lastrowid
+
+    @staticmethod
+    def _index(connection: sqlite3.Connection, record_id: int, entry: Dict[str, Any]):
+        document = _search_document(entry)
+        if document is not None:
+            connection.execute(
+                f"INSERT INTO history_fts (rowid, {', '.join(SEARCH_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [record_id] + document
+            )
+
+    def _index_missing(self, connection: sqlite3.Connection):
+        """Index records written before the full-text index existed"""
+        last_indexed = connection.execute("SELECT COALESCE(MAX(rowid), 0) FROM history_fts").fetchone()[0]
+        rows = connection.execute("SELECT id, payload FROM history WHERE id > ? ORDER BY id",
+                                  (last_indexed,))
+        for row in rows.fetchall():
+            self._index(connection, row["id"], json.loads(row["payload"]))
+
+    def add(self, entry: Dict[str, Any], source_file: Optional[str] = None) -> int:
+        """Store one history entry (its "type" key is required) and return its id"""
+        ref, success = _describe(entry)
+        with self._connect() as connection:
+            return self._insert(connection, entry, entry["type"], ref, success, source_file=source_file)
+
+    def add_parsing_run(self, results: List[Dict[str, Any]], timestamp: Optional[str] = None,
+                        run_id: Optional[str] = None, source_file: Optional[str] = None) -> str:
+        """Store the per-URL results of one parsing run in one transaction and return the run id"""
+        run_id = run_id or uuid.uuid4().hex
+        timestamp = timestamp or datetime.now().isoformat()
+        with self._connect() as connection:
+            for result in results:
+                entry = dict(result, type=PARSING_TYPE, timestamp=result.get("timestamp") or timestamp)
+                self._insert(connection, entry, PARSING_TYPE, result.get("url"),
+                             int(bool(result.get("success"))), run_id, source_file)
+        return run_id
+
+    def get(self, record_id: int) -> Optional[Dict[str, Any]]:
+        """Full record, payload included"""
+        row = self._connect().execute(
+            f"SELECT {_SUMMARY_COLUMNS}, payload FROM history WHERE id = ?", (record_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = _summary(row)
+        record["payload"] = json.loads(record["payload"])
+        return record
+
+    def get_run(self, run_id: str) -> List[Dict[str, Any]]:
+        """Payloads of all results of one parsing run, in insertion order"""
+        rows = self._connect().execute(
+            "SELECT payload FROM history WHERE run_id = ? ORDER BY id", (run_id,)
+        ).fetchall()
+        return [json.loads(row["payload"]) for row in rows]
+
+    def latest(self, entry_type: str, ref: Optional[str] = None,
+               success: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+        """Most recent record of a type (and ref), payload included"""
+        page = self.list(limit=1, entry_type=entry_type, ref=ref, success=success)
+        return self.get(page["items"][0]["id"]) if page["items"] else None
+
+    def list(self, limit: int = 50, cursor: Optional[int] = None, entry_type: Optional[str] = None,
+             ref: Optional[str] = None, success: Optional[bool] = None, since: Optional[str] = None,
+             until: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Newest-first page of record summaries. Pass the returned next_cursor
+        back as `cursor` for the following page; it is None on the last page.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        conditions, params = [], []
+        for condition, value in (("id < ?", cursor), ("type = ?", entry_type), ("ref = ?", ref),
+                                 ("success = ?", None if success is None else int(success)),
+                                 ("timestamp >= ?", since), ("timestamp < ?", until)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connect().execute(
+            f"SELECT {_SUMMARY_COLUMNS} FROM history {where} ORDER BY id DESC LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+        items = [_summary(row) for row in rows[:limit]]
+        next_cursor = items[-1]["id"] if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def search(self, query: str, field: Optional[str] = None, entry_type: Optional[str] = None,
+               limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Records matching `query`, best first (bm25), each with a highlighted
+        snippet of its best-matching field. See fts_query() for the syntax.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        conditions, params = ["history_fts MATCH ?"], [fts_query(query, field)]
+        if entry_type is not None:
+            conditions.append("h.type = ?")
+            params.append(entry_type)
+        rows = self._connect().execute(
+            f"SELECT h.id, h.type, h.timestamp, h.ref, h.success, h.run_id, "
+            f"snippet(history_fts, -1, '[', ']', '...', 16) AS snippet, "
+            f"bm25(history_fts, {_SEARCH_WEIGHTS}) AS rank "
+            f"FROM history_fts JOIN history h ON h.id = history_fts.rowid "
+            f"WHERE {' AND '.join(conditions)} ORDER BY rank LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        results = []
+        for row in rows:
+            item = _summary(row)
+            item["score"] = round(-item.pop("rank"), 4)
+            results.append(item)
+        return results
+
+    def import_directory(self, directory: str = HISTORY_DIR) -> int:
+        """Import legacy history/*.json files not imported yet; returns the number of files imported"""
+        if not os.path.isdir(directory):
+            return 0
+        imported = 0
+        connection = self._connect()
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".json"):
+                continue
+            if connection.execute("SELECT 1 FROM history WHERE source_file = ? LIMIT 1",
+                                  (filename,)).fetchone():
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Skipping unreadable history file {filename}: {e}")
+                continue
+            if not isinstance(entry, dict):
+                continue
+            modified = datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+            if "results" in entry and "type" not in entry:
+                self.add_parsing_run(entry["results"], entry.get("timestamp") or modified,
+                                     os.path.splitext(filename)[0], filename)
+            else:
+                entry.setdefault("type", "analysis")
+                entry.setdefault("timestamp", modified)
+                self.add(entry, source_file=filename)
+            imported += 1
+        return imported
+
+
+_history_store: Optional[HistoryStore] = None
+_history_store_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    """Get or create the process-wide history store"""
+    global _history_store
+    with _history_store_lock:
+        if _history_store is None:
+            _history_store = HistoryStore()
+        return _history_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import legacy JSON history files into the history store")
+    parser.add_argument("--import-dir", default=HISTORY_DIR, help="Directory of history JSON files")
+    args = parser.parse_args()
+    count = get_history_store().import_directory(args.import_dir)
+    print(f"Imported {count} history files into {HISTORY_DB_FILE}")
+
+
+if __name__ == "__main__":
+    main()
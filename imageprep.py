@@ -0,0 +1,98 @@
+"""Image preprocessing before vision analysis: real format, downscale, re-encode, detail level"""
+import io
+import math
+from typing import Any, Dict, Optional, Tuple
+from PIL import Image, ImageOps, UnidentifiedImageError
+from config import IMAGE_MAX_EDGE, IMAGE_JPEG_QUALITY, IMAGE_DETAIL, IMAGE_LOW_DETAIL_MAX_EDGE
+
+# Formats the vision API accepts as-is
+_PASSTHROUGH_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+
+def estimate_image_tokens(width: int, height: int, detail: str = "high") -> int:
+    """
+    Vision token cost of an image: a flat 85 for low detail, otherwise 85 plus
+    170 per 512px tile after fitting into 2048x2048 and scaling the shortest
+    side down to 768px.
+    """
+    if detail == "low" or not width or not height:
+        return 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def choose_detail(width: int, height: int) -> str:
+    """Low detail for images small enough that high detail would add nothing"""
+    if IMAGE_DETAIL != "auto":
+        return IMAGE_DETAIL
+    return "low" if max(width, height) <= IMAGE_LOW_DETAIL_MAX_EDGE else "high"
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """RGB copy of the image, compositing any transparency onto white"""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _encode(image: Image.Image, image_format: str, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def preprocess_image(image_bytes: bytes, max_edge: int = IMAGE_MAX_EDGE,
+                     quality: int = IMAGE_JPEG_QUALITY) -> Tuple[bytes, str, Optional[str], Dict[str, Any]]:
+    """
+    Detect the real format, apply EXIF orientation, downscale to `max_edge`,
+    drop metadata and re-encode (JPEG, or PNG when that is smaller for lossless
+    sources). Uploads already smaller than any re-encoding and free of EXIF are
+    kept as-is. Returns (data, mime_type, detail, stats); data that Pillow
+    cannot decode is passed through unchanged with detail None.
+    """
+    stats: Dict[str, Any] = {"bytes_before": len(image_bytes)}
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            source_format = image.format
+            has_exif = "exif" in image.info
+            image.seek(0)  # First frame of animated images
+            image = ImageOps.exif_transpose(image)
+            original_size = image.size
+            if max(image.size) > max_edge:
+                image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            image = _flatten(image)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        stats.update(format_before=None, bytes_after=len(image_bytes), error=str(e))
+        return image_bytes, "image/jpeg", None, stats
+
+    data, mime_type = _encode(image, "JPEG", quality=quality, optimize=True, progressive=True), "image/jpeg"
+    if source_format in ("PNG", "GIF", "BMP"):
+        # Flat UI screenshots and graphics often compress better losslessly
+        png = _encode(image, "PNG", optimize=True)
+        if len(png) < len(data):
+            data, mime_type = png, "image/png"
+    if len(image_bytes) <= len(data) and source_format in _PASSTHROUGH_FORMATS and not has_exif:
+        # The upload is already smaller than any re-encoding and carries no EXIF
+        data, mime_type = image_bytes, _PASSTHROUGH_FORMATS[source_format]
+        image_size = original_size
+    else:
+        image_size = image.size
+
+    detail = choose_detail(*image_size)
+    stats.update(
+        format_before=source_format,
+        size_before=list(original_size),
+        size_after=list(image_size),
+        bytes_after=len(data),
+        format_after=mime_type,
+        detail=detail,
+        tokens_before=estimate_image_tokens(*original_size),
+        tokens_after=estimate_image_tokens(*image_size, detail),
+    )
+    return data, mime_type, detail, stats
@@ -0,0 +1,201 @@
+"""Background parse and crawl jobs: submit, poll progress and partial results, cancel"""
+import asyncio
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from config import COMPETITOR_URLS, JOBS_MAX_WORKERS, JOBS_MAX_KEPT, CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES
+from parsingservice import get_parsing_service
+from crawler import Crawler
+from pagediff import diff_results, reanalyze_changes
+
+FINAL_STATUSES = ("completed", "cancelled", "failed")
+
+
+class JobManager:
+    """
+    Runs parse jobs on a small worker pool. Job state lives in memory; the
+    most recent `max_kept` finished jobs stay available for polling. Results
+    are stored in history as with /parsedemo. Change re-analysis runs on
+    `loop`, the event loop that owns the shared async OpenAI client.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_workers: int = JOBS_MAX_WORKERS,
+                 max_kept: int = JOBS_MAX_KEPT):
+        self.loop = loop
+        self.max_kept = max_kept
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="parse-job")
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def submit_parse(self, urls: Optional[List[str]] = None, concurrent: Optional[bool] = None,
+                     use_cache: bool = True, reanalyze: bool = False) -> Dict[str, Any]:
+        """Queue a parse of `urls` (default: COMPETITOR_URLS) and return the new job"""
+        urls = list(urls or COMPETITOR_URLS)
+        job = self._add_job("parse", total=len(urls), results=[None] * len(urls))
+        self._executor.submit(self._run, job["id"], urls, concurrent, use_cache, reanalyze)
+        return self.get(job["id"])
+
+    def submit_crawl(self, urls: Optional[List[str]] = None, max_depth: int = CRAWL_MAX_DEPTH,
+                     max_pages: int = CRAWL_MAX_PAGES, use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Queue a crawl from `urls` (default: COMPETITOR_URLS) and return the new
+        job. Its total is not known up front, so pages are appended to results
+        as they finish.
+        """
+        urls = list(urls or COMPETITOR_URLS)
+        job = self._add_job("crawl", total=None, results=[])
+        self._executor.submit(self._run_crawl, job["id"], urls, max_depth, max_pages, use_cache)
+        return self.get(job["id"])
+
+    def get(self, job_id: str, include_results: bool = True) -> Optional[Dict[str, Any]]:
+        """Snapshot of a job; pending URLs have None results"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job, results=list(job["results"]))
+        if not include_results:
+            snapshot.pop("results")
+            snapshot.pop("changes")
+        return snapshot
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Snapshots of all kept jobs without their results, newest first"""
+        with self._lock:
+            job_ids = list(reversed(self._jobs))
+        return [job for job in (self.get(job_id, include_results=False) for job_id in job_ids) if job]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Skip the sites of a job not started yet; sites being parsed finish first"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] not in FINAL_STATUSES:
+                self._cancel_events[job_id].set()
+                if job["status"] == "queued":
+                    job["status"] = "cancelled"
+                    job["finished"] = datetime.now().isoformat()
+                else:
+                    job["status"] = "cancelling"
+        return self.get(job_id, include_results=False)
+
+    def shutdown(self):
+        """Cancel outstanding jobs and stop the worker pool"""
+        with self._lock:
+            for event in self._cancel_events.values():
+                event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _add_job(self, job_type: str, total: Optional[int], results: List[Any]) -> Dict[str, Any]:
+        job = {
+            "id": uuid.uuid4().hex,
+            "type": job_type,
+            "status": "queued",
+            "created": datetime.now().isoformat(),
+            "started": None,
+            "finished": None,
+            "total": total,
+            "done": 0,
+            "failed": 0,
+            "results": results,
+            "changes": None,
+            "run_id": None,
+            "error": None
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._cancel_events[job["id"]] = threading.Event()
+            self._evict()
+        return job
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _on_result(self, job_id: str, index: Optional[int], result: Dict[str, Any]):
+        with self._lock:
+            job = self._jobs[job_id]
+            if index is None:
+                job["results"].append(result)
+            else:
+                job["results"][index] = result
+            job["done"] += 1
+            if not result.get("success") and not result.get("cancelled"):
+                job["failed"] += 1
+
+    def _run(self, job_id: str, urls: List[str], concurrent: Optional[bool],
+             use_cache: bool, reanalyze: bool):
+        cancel = self._cancel_events.get(job_id)
+        if cancel is None or cancel.is_set():
+            return
+        self._update(job_id, status="running", started=datetime.now().isoformat())
+        service = get_parsing_service()
+        try:
+            results = service.parse_all_competitors(
+                urls=urls, concurrent=concurrent, use_cache=use_cache,
+                on_result=lambda index, result: self._on_result(job_id, index, result), cancel=cancel
+            )
+            parsed = [result for result in results if not result.get("cancelled")]
+            changes = diff_results(parsed)
+            run_id = service.save_to_history(parsed) if parsed else None
+            if reanalyze and run_id and not cancel.is_set():
+                asyncio.run_coroutine_threadsafe(
+                    reanalyze_changes(changes, run_id, use_cache=use_cache), self.loop
+                ).result()
+            outcome = {"status": "cancelled" if cancel.is_set() else "completed",
+                       "changes": changes, "run_id": run_id}
+        except Exception as e:
+            outcome = {"status": "failed", "error": str(e)}
+        finally:
+            service.close()
+        self._update(job_id, finished=datetime.now().isoformat(), **outcome)
+
+    def _run_crawl(self, job_id: str, urls: List[str], max_depth: int, max_pages: int, use_cache: bool):
+        cancel = self._cancel_events.get(job_id)
+        if cancel is None or cancel.is_set():
+            return
+        self._update(job_id, status="running", started=datetime.now().isoformat())
+        service = get_parsing_service()
+        try:
+            crawler = Crawler(service, max_depth=max_depth, max_pages=max_pages)
+            results = crawler.crawl(urls, use_cache=use_cache, cancel=cancel,
+                                    on_result=lambda result: self._on_result(job_id, None, result))
+            changes = diff_results(results)
+            run_id = service.save_to_history(results) if results else None
+            outcome = {"status": "cancelled" if cancel.is_set() else "completed",
+                       "changes": changes, "run_id": run_id, "total": len(results)}
+        except Exception as e:
+            outcome = {"status": "failed", "error": str(e)}
+        finally:
+            service.close()
+        self._update(job_id, finished=datetime.now().isoformat(), **outcome)
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in FINAL_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.max_kept)]:
+            del self._jobs[job_id]
+            del self._cancel_events[job_id]
+
+
+_job_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """Get or create the job manager; the first call must come from the running event loop"""
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager(asyncio.get_running_loop())
+    return _job_manager
+
+
+def shutdown_job_manager():
+    """Cancel outstanding jobs of the job manager, if one was created"""
+    global _job_manager
+    if _job_manager is not None:
+        _job_manager.shutdown()
+        _job_manager = None
@@ -0,0 +1,62 @@
+"""Incremental parsing of a streamed JSON object, one top-level field at a time"""
+import json
+from typing import Any, List, Tuple
+
+
+class JsonFieldStream:
+    """
+    Feed the text of a JSON object as it arrives; every call returns the
+    (key, value) pairs of top-level fields completed by that piece. Nested
+    objects and arrays are returned whole once their closing bracket arrives.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0  # Next character to scan
+        self._member_start = None  # Start of the current top-level member
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.finished = False
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        self._buffer += text
+        fields = []
+        buffer = self._buffer
+        for index in range(self._position, len(buffer)):
+            char = buffer[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._member_start = index + 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0 and self._member_start is not None:
+                    fields.extend(self._member(buffer[self._member_start:index]))
+                    self._member_start = None
+                    self.finished = True
+            elif char == "," and self._depth == 1:
+                fields.extend(self._member(buffer[self._member_start:index]))
+                self._member_start = index + 1
+        self._position = len(buffer)
+        return fields
+
+    @staticmethod
+    def _member(text: str) -> List[Tuple[str, Any]]:
+        if not text.strip():
+            return []
+        try:
+            return list(json.loads("{" + text + "}").items())
+        except ValueError:
+            # Malformed member: the final json.loads of the whole reply reports it
+            return []
@@ -0,0 +1,149 @@
+"""Two-level (memory + disk) cache for LLM analysis results"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from config import LLM_CACHE_DIR, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_BYTES
+
+
+def make_key(model: str, prompt_version: str, temperature: float, kind: str, content: bytes) -> str:
+    """Cache key for one analysis request"""
+    digest = hashlib.sha256()
+    for part in (model, prompt_version, repr(temperature), kind):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(content)
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """
+    Results are kept in an in-memory LRU of `max_entries` items backed by one
+    JSON file per key in `directory`. Entries older than `ttl` seconds are
+    ignored, and the oldest files are removed once the directory grows past
+    `max_bytes`.
+    """
+
+    def __init__(self, directory: Optional[str] = LLM_CACHE_DIR, ttl: float = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached value for `key` or None, counting hits and misses"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry["stored_at"] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry["value"]
+
+        entry = self._read(key)
+        with self._lock:
+            if entry is None or now - entry["stored_at"] > self.ttl:
+                self._memory.pop(key, None)
+                self.misses += 1
+                return None
+            self._remember(key, entry)
+            self.hits += 1
+        return entry["value"]
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """Store `value` in memory and on disk"""
+        entry = {"stored_at": time.time(), "value": value}
+        with self._lock:
+            self._remember(key, entry)
+        if self.directory:
+            tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            try:
+                replaced = os.path.getsize(self._path(key))  # Overwriting a key frees its old file
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, self._path(key))
+            with self._lock:
+                if self._disk_bytes is not None:
+                    self._disk_bytes += os.path.getsize(self._path(key)) - replaced
+                scan = self._disk_bytes is None or self._disk_bytes > self.max_bytes
+            if scan:
+                self._evict_disk()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current sizes"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # Keep recently used files away from eviction
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def _evict_disk(self):
+        """Recount the directory size and drop least recently used files over the limit"""
+        files = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total > self.max_bytes:
+            for _, size, path in sorted(files):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        with self._lock:
+            self._disk_bytes = total
+
+
+_llm_cache: Optional[LLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Get or create the process-wide LLM cache"""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMCache()
+        return _llm_cache
@@ -1,20 +1,75 @@
 """FastAPI application for Competitor Analyzer"""
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Awaitable, AsyncIterator, Callable, Dict, List, Optional
+import asyncio
 import os
-import shutil
 from datetime import datetime
 import json
 
-from openaiservice import analyze_image, analyze_text
+from openaiservice import (
+    analyze_image_async, analyze_text_async, analyze_text_stream, close_async_client, get_cache_stats,
+    get_rate_limit_stats
+)
 from parsingservice import ParsingService, get_parsing_service
-from config import HISTORY_DIR
+from driverpool import get_driver_pool, shutdown_driver_pool
+from historystore import get_history_store
+from pagediff import diff_results, reanalyze_changes
+from scheduler import get_scheduler
+from jobs import get_job_manager, shutdown_job_manager
+from metrics import MetricsMiddleware, render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from config import (
+    HISTORY_DIR, BATCH_MAX_ITEMS, BATCH_MAX_CONCURRENCY, BATCH_MAX_BYTES, UPLOAD_MAX_BYTES,
+    UPLOAD_FORM_OVERHEAD, UPLOAD_CHUNK_SIZE, SCHEDULER_ENABLED, CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES
+)
+
+
+class UploadLimitMiddleware:
+    """
+    Reject uploads over the limit of their route before the multipart body
+    is received and spooled: at once when Content-Length is over it, else as
+    soon as the bytes received so far are
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        detail = f"Request body exceeds the upload limit of {limit} bytes"
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > limit:
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+        received = 0
+
+        async def receive_within_limit():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, receive_within_limit, send)
+
 
 app = FastAPI(title="Competitor Analyzer API", version="1.0.0")
 
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/analyzeimage": UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD,
+    "/analyzeimage/batch": BATCH_MAX_BYTES + BATCH_MAX_ITEMS * UPLOAD_FORM_OVERHEAD,
+})
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -23,14 +78,136 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Ensure history directory exists
 os.makedirs(HISTORY_DIR, exist_ok=True)
-os.makedirs("uploads", exist_ok=True)
+
+@app.on_event("startup")
+async def startup():
+    """Import legacy history files and warm up the WebDriver pool so the first parse does not pay browser startup"""
+    imported = await run_in_threadpool(get_history_store().import_directory)
+    if imported:
+        print(f"Imported {imported} history files into the history store")
+    try:
+        await run_in_threadpool(get_driver_pool().start)
+    except Exception as e:
+        print(f"Driver pool warm-up failed, drivers will be created on demand: {e}")
+    if SCHEDULER_ENABLED:
+        await get_scheduler().start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the scheduler, quit pooled WebDrivers and close the OpenAI connection pool"""
+    if SCHEDULER_ENABLED:
+        await get_scheduler().stop()
+    shutdown_job_manager()
+    await run_in_threadpool(shutdown_driver_pool)
+    await close_async_client()
 
 
 class TextAnalysisRequest(BaseModel):
     text: str
+    bypass_cache: bool = False
+
+
+class TextBatchRequest(BaseModel):
+    texts: List[str]
+    bypass_cache: bool = False
+
+
+class ParseJobRequest(BaseModel):
+    urls: Optional[List[str]] = None  # Default: COMPETITOR_URLS
+    concurrent: Optional[bool] = None
+    use_cache: bool = True
+    reanalyze: bool = False
+
+
+class CrawlJobRequest(BaseModel):
+    urls: Optional[List[str]] = None  # Start pages, default: COMPETITOR_URLS
+    max_depth: int = CRAWL_MAX_DEPTH  # Link hops from the start page
+    max_pages: int = CRAWL_MAX_PAGES  # Per site
+    use_cache: bool = True
+
+
+async def read_upload(file: UploadFile, limit: int = UPLOAD_MAX_BYTES) -> bytes:
+    """Read an uploaded file into memory, rejecting it once it exceeds `limit` bytes"""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413,
+                                detail=f"{file.filename} exceeds the upload limit of {limit} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def text_preview(text: str) -> str:
+    return text[:200] + "..." if len(text) > 200 else text
+
+
+def save_history_entry(history_entry: Dict[str, Any]) -> int:
+    """Store a history record and return its id"""
+    return get_history_store().add(history_entry)
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_batch(history_type: str, items: List[Dict[str, Any]],
+                       analyze: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]) -> AsyncIterator[str]:
+    """
+    Run `analyze` over `items` with bounded concurrency and yield one NDJSON
+    line per item as it completes. A failing item is reported in its own line
+    without failing the batch; the whole batch is saved as one history record.
+    """
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+    
+    async def run(index: int, item: Dict[str, Any]):
+        async with semaphore:
+            try:
+                result = await analyze(item)
+            except Exception as e:
+                result = {"success": False, "error": str(e), "analysis": None}
+        return index, result
+    
+    started = datetime.now()
+    tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(items)]
+    records: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            record = {key: value for key, value in items[index].items() if not key.startswith("_")}
+            record.update(index=index, success=bool(result.get("success")), result=result)
+            records[index] = record
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+    finally:
+        # The client may disconnect mid-stream (the generator is then cancelled or closed):
+        # stop outstanding work and keep what finished
+        for task in tasks:
+            task.cancel()
+        completed = [record for record in records if record is not None]
+        history_entry = {
+            "type": history_type,
+            "timestamp": datetime.now().isoformat(),
+            "elapsed": round((datetime.now() - started).total_seconds(), 3),
+            "total": len(items),
+            "succeeded": sum(1 for record in completed if record["success"]),
+            "items": completed
+        }
+        # Saved synchronously (one small insert): an await here would be cancelled again on disconnect
+        history_id = save_history_entry(history_entry)
+        summary = {"done": True, "total": len(items), "succeeded": history_entry["succeeded"],
+                   "history_id": history_id}
+        await asyncio.gather(*tasks, return_exceptions=True)
+    yield json.dumps(summary) + "\n"
 
 
 @app.get("/")
@@ -39,18 +216,16 @@ async def root():
 
 
 @app.post("/analyzeimage")
-async def analyze_image_endpoint(file: UploadFile = File(...)):
+async def analyze_image_endpoint(file: UploadFile = File(...), bypass_cache: bool = False):
     """
     Analyze an uploaded image for competitor insights
     """
     try:
-        # Save uploaded file temporarily
-        file_path = f"uploads/{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Read the upload in memory: no temp files, no name collisions
+        image_bytes = await read_upload(file)
         
         # Analyze the image
-        result = analyze_image(file_path)
+        result = await analyze_image_async(image_bytes, use_cache=not bypass_cache)
         
         # Save to history
         history_entry = {
@@ -59,21 +234,15 @@ async def analyze_image_endpoint(file: UploadFile = File(...)):
             "filename": file.filename,
             "result": result
         }
-        history_file = os.path.join(HISTORY_DIR, f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-        with open(history_file, 'w', encoding='utf-8') as f:
-            json.dump(history_entry, f, ensure_ascii=False, indent=2)
-        
-        # Clean up temporary file
-        try:
-            os.remove(file_path)
-        except:
-            pass
+        await run_in_threadpool(save_history_entry, history_entry)
         
         if result.get("success"):
             return JSONResponse(content=result)
         else:
             raise HTTPException(status_code=500, detail=result.get("error", "Analysis failed"))
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -85,18 +254,16 @@ async def analyze_text_endpoint(request: TextAnalysisRequest):
     """
     try:
         # Analyze the text
-        result = analyze_text(request.text)
+        result = await analyze_text_async(request.text, use_cache=not request.bypass_cache)
         
         # Save to history
         history_entry = {
             "type": "text_analysis",
             "timestamp": datetime.now().isoformat(),
-            "text_preview": request.text[:200] + "..." if len(request.text) > 200 else request.text,
+            "text_preview": text_preview(request.text),
             "result": result
         }
-        history_file = os.path.join(HISTORY_DIR, f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-        with open(history_file, 'w', encoding='utf-8') as f:
-            json.dump(history_entry, f, ensure_ascii=False, indent=2)
+        await run_in_threadpool(save_history_entry, history_entry)
         
         if result.get("success"):
             return JSONResponse(content=result)
@@ -107,32 +274,115 @@ async def analyze_text_endpoint(request: TextAnalysisRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/analyzetext/stream")
+async def analyze_text_stream_endpoint(request: TextAnalysisRequest):
+    """
+    Analyze text content, streaming Server-Sent Events: "token" (model output
+    as it arrives), "field" (each completed top-level field of the analysis),
+    "chunks" (long text only) and a final "done" carrying the /analyzetext result
+    """
+    async def events():
+        async for event, data in analyze_text_stream(request.text, use_cache=not request.bypass_cache):
+            if event == "done":
+                history_entry = {
+                    "type": "text_analysis",
+                    "timestamp": datetime.now().isoformat(),
+                    "text_preview": text_preview(request.text),
+                    "result": data
+                }
+                await run_in_threadpool(save_history_entry, history_entry)
+            yield sse_event(event, data)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/analyzetext/batch")
+async def analyze_text_batch_endpoint(request: TextBatchRequest):
+    """
+    Analyze many text snippets, streaming one NDJSON line per snippet as it completes
+    """
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="No texts provided")
+    if len(request.texts) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+    
+    items = [{"text_preview": text_preview(text), "_text": text} for text in request.texts]
+    
+    async def analyze(item):
+        return await analyze_text_async(item["_text"], use_cache=not request.bypass_cache)
+    
+    return StreamingResponse(stream_batch("batch_text_analysis", items, analyze),
+                             media_type="application/x-ndjson")
+
+
+@app.post("/analyzeimage/batch")
+async def analyze_image_batch_endpoint(files: List[UploadFile] = File(...), bypass_cache: bool = False):
+    """
+    Analyze many uploaded images, streaming one NDJSON line per image as it completes
+    """
+    if len(files) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+    # Every image stays in memory until the batch finishes, so the batch as a whole has a budget
+    if sum(file.size or 0 for file in files) > BATCH_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds the upload limit of {BATCH_MAX_BYTES} bytes")
+    
+    # Read uploads before streaming starts: the form is closed once this handler returns
+    items = []
+    remaining = BATCH_MAX_BYTES
+    for file in files:
+        image = await read_upload(file, min(UPLOAD_MAX_BYTES, remaining))
+        remaining -= len(image)
+        items.append({"filename": file.filename, "_image": image})
+    
+    async def analyze(item):
+        return await analyze_image_async(item["_image"], use_cache=not bypass_cache)
+    
+    return StreamingResponse(stream_batch("batch_image_analysis", items, analyze),
+                             media_type="application/x-ndjson")
+
+
 @app.get("/parsedemo")
-async def parse_demo():
+async def parse_demo(concurrent: Optional[bool] = None, use_cache: bool = True, reanalyze: bool = False):
     """
-    Demo endpoint to parse competitor websites
+    Demo endpoint to parse competitor websites. Each page is diffed against
+    its last stored parse; with `reanalyze` only the changed content is sent
+    for text analysis.
     """
     parsing_service = None
     try:
         parsing_service = get_parsing_service()
         
         # Parse all competitors
-        results = parsing_service.parse_all_competitors()
+        started = datetime.now()
+        results = await run_in_threadpool(parsing_service.parse_all_competitors,
+                                          concurrent=concurrent, use_cache=use_cache)
+        elapsed = (datetime.now() - started).total_seconds()
+        
+        # Diff against the previous run before this one is stored
+        changes = await run_in_threadpool(diff_results, results)
         
         # Save to history
-        history_file = parsing_service.save_to_history(results)
+        run_id = await run_in_threadpool(parsing_service.save_to_history, results)
+        
+        if reanalyze:
+            await reanalyze_changes(changes, run_id, use_cache=use_cache)
         
         return JSONResponse(content={
             "success": True,
             "results": results,
-            "history_file": history_file,
+            "changes": changes,
+            "run_id": run_id,
+            "elapsed": round(elapsed, 3),
+            "unchanged": sum(1 for r in results if r.get("unchanged")),
+            "changed": sum(1 for change in changes if change["status"] == "changed"),
             "message": f"Parsed {len(results)} competitor sites"
         })
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        # Ensure driver is closed even if error occurs
+        # Return leased drivers to the pool even if error occurs
         if parsing_service:
             try:
                 parsing_service.close()
@@ -140,33 +390,154 @@ async def parse_demo():
                 pass
 
 
+@app.post("/jobs/parse", status_code=202)
+async def submit_parse_job(request: ParseJobRequest):
+    """
+    Start parsing competitor websites in the background and return the job
+    at once; poll GET /jobs/{id} for progress and partial results
+    """
+    job = get_job_manager().submit_parse(request.urls, request.concurrent,
+                                              request.use_cache, request.reanalyze)
+    return {"success": True, "job": job}
+
+
+@app.post("/jobs/crawl", status_code=202)
+async def submit_crawl_job(request: CrawlJobRequest):
+    """
+    Crawl competitor websites in the background, following same-site links
+    from each start page; poll GET /jobs/{id} for the pages parsed so far
+    """
+    job = get_job_manager().submit_crawl(request.urls, request.max_depth,
+                                         request.max_pages, request.use_cache)
+    return {"success": True, "job": job}
+
+
+@app.get("/jobs")
+async def list_jobs():
+    """
+    Recent jobs without their results, newest first
+    """
+    return {"success": True, "jobs": get_job_manager().list()}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Job status with per-URL results so far (null for URLs not parsed yet)
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"success": True, "job": job}
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    Cancel a job: sites not started yet are skipped, sites in progress finish
+    """
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"success": True, "job": job}
+
+
 @app.get("/history")
-async def get_history():
+async def get_history(limit: int = Query(50, ge=1, le=500), cursor: Optional[int] = None,
+                      type: Optional[str] = None, ref: Optional[str] = None,
+                      success: Optional[bool] = None, since: Optional[str] = None,
+                      until: Optional[str] = None):
     """
-    Get analysis history
+    Get analysis history, newest first. Filter by type, ref (URL, filename or
+    text preview), success and timestamp range; pass next_cursor back as
+    `cursor` for the next page.
     """
     try:
-        history_files = []
-        if os.path.exists(HISTORY_DIR):
-            for filename in os.listdir(HISTORY_DIR):
-                if filename.endswith('.json'):
-                    file_path = os.path.join(HISTORY_DIR, filename)
-                    file_stat = os.stat(file_path)
-                    history_files.append({
-                        "filename": filename,
-                        "size": file_stat.st_size,
-                        "modified": datetime.fromtimestamp(file_stat.st_mtime).isoformat()
-                    })
-        
-        return JSONResponse(content={
-            "success": True,
-            "files": sorted(history_files, key=lambda x: x["modified"], reverse=True)
-        })
+        page = await run_in_threadpool(get_history_store().list, limit, cursor, type, ref,
+                                       success, since, until)
+        return JSONResponse(content=dict(page, success=True))
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/history/search")
+async def search_history(q: str, field: Optional[str] = None, type: Optional[str] = None,
+                         limit: int = Query(20, ge=1, le=500), offset: int = Query(0, ge=0)):
+    """
+    Full-text search over analysis strengths, weaknesses, SEO keywords, key
+    messaging and parsed headings and page text. Results are ranked best
+    first, each with a highlighted snippet; `field` restricts the match to one
+    of those fields and "quoted text" matches as a phrase.
+    """
+    try:
+        results = await run_in_threadpool(get_history_store().search, q, field, type, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content={"success": True, "query": q, "results": results})
+
+
+@app.get("/history/{record_id}")
+async def get_history_record(record_id: int):
+    """
+    Get one history record with its full payload
+    """
+    record = await run_in_threadpool(get_history_store().get, record_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="History record not found")
+    return JSONResponse(content=record)
+
+
+@app.get("/schedules")
+async def list_schedules():
+    """
+    Monitoring schedules with their next/last run, status and failure count
+    """
+    if not SCHEDULER_ENABLED:
+        return {"success": True, "enabled": False, "schedules": []}
+    return {"success": True, "enabled": True, "schedules": await get_scheduler().list()}
+
+
+@app.post("/schedules/{schedule_id}/{action}")
+async def control_schedule(schedule_id: int, action: str):
+    """
+    Pause, resume or trigger (run now) one schedule
+    """
+    if not SCHEDULER_ENABLED:
+        raise HTTPException(status_code=409, detail="Scheduler is disabled")
+    scheduler = get_scheduler()
+    actions = {"pause": scheduler.pause, "resume": scheduler.resume, "trigger": scheduler.trigger}
+    if action not in actions:
+        raise HTTPException(status_code=400, detail=f"Unknown action: {action}")
+    if not await actions[action](schedule_id):
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return {"success": True, "action": action, "schedule_id": schedule_id}
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Hit/miss counters of the LLM analysis cache
+    """
+    return {"success": True, "llm_cache": get_cache_stats()}
+
+
+@app.get("/ratelimit/stats")
+async def rate_limit_stats():
+    """
+    Per-minute limits, adaptive concurrency and retry counters of OpenAI requests
+    """
+    return {"success": True, "rate_limit": get_rate_limit_stats()}
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: parser stages, OpenAI calls and API requests
+    """
+    return Response(content=render_metrics(), headers={"Content-Type": METRICS_CONTENT_TYPE})
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -0,0 +1,93 @@
+"""Prometheus metrics of parser stages, OpenAI calls and API requests"""
+import time
+from typing import Dict, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.routing import Match
+
+# Latency buckets in seconds, from fast extraction steps up to slow page loads and model calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST  # Includes the charset, so set it as a header rather than media_type
+
+# Route templates remembered per (method, path); cleared when full so ids in paths cannot grow it forever
+_ROUTE_CACHE_SIZE = 1024
+
+
+def render() -> bytes:
+    """All metrics in the Prometheus text format"""
+    return generate_latest()
+
+
+# Parsing
+PARSER_STAGE_SECONDS = Histogram(
+    "parser_stage_seconds", "Duration of parsing stages: driver_startup, driver_lease, http_fetch, "
+    "page_load, wait and extract (HTML parse and data extraction, one pass)", ["stage"], buckets=DEFAULT_BUCKETS
+)
+
+# OpenAI
+OPENAI_REQUEST_SECONDS = Histogram(
+    "openai_request_seconds", "Duration of OpenAI completions including rate limit waits and retries", ["kind"],
+    buckets=DEFAULT_BUCKETS
+)
+OPENAI_TOKENS = Counter("openai_tokens", "Tokens reported in response usage", ["kind", "type"])
+OPENAI_ERRORS = Counter("openai_errors", "OpenAI completions that failed, by exception type", ["kind", "error"])
+LLM_CACHE_LOOKUPS = Counter("llm_cache_lookups", "Analysis cache lookups", ["result"])
+
+# HTTP API
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "API request duration until the response body is sent",
+    ["method", "route", "status"], buckets=DEFAULT_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "API requests being handled", ["method", "route"])
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and in-flight requests per route
+    template (e.g. /history/{record_id}), so labels stay bounded
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[Tuple[str, str], str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method, route = scope["method"], self._route(scope)
+        in_flight = HTTP_IN_FLIGHT.labels(method, route)
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            HTTP_REQUEST_SECONDS.labels(method, route, status[0]).observe(time.perf_counter() - started)
+
+    def _route(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        route = self._routes.get(key)
+        if route is None:
+            route = self._match(scope)
+            if len(self._routes) >= _ROUTE_CACHE_SIZE:
+                self._routes.clear()
+            self._routes[key] = route
+        return route
+
+    @staticmethod
+    def _match(scope) -> str:
+        # Same linear match the router does; needed before the request is routed
+        app = scope.get("app")
+        for route in app.router.routes if app is not None else ():
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
@@ -1,30 +1,55 @@
 """OpenAI service for analyzing competitor content"""
+import asyncio
 import json
 import base64
-from typing import Dict, Any, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, Union
+import httpx
 import openai
-from config import OPENAI_API_KEY, USE_PROXY, PROXY_API_KEY, PROXY_API_URL
+from config import (
+    OPENAI_API_KEY, USE_PROXY, PROXY_API_KEY, PROXY_API_URL, LLM_CACHE_ENABLED,
+    OPENAI_MAX_CONNECTIONS, OPENAI_TIMEOUT, IMAGE_PREPROCESS,
+    IMAGE_MAX_EDGE, IMAGE_JPEG_QUALITY, IMAGE_DETAIL, TEXT_CHUNK_TOKENS,
+    TEXT_CHUNK_CONCURRENCY, TEXT_REDUCE_FANIN, OPENAI_COMPLETION_ESTIMATE
+)
+from llmcache import get_llm_cache, make_key
+from imageprep import preprocess_image
+from chunking import split_text, estimate_tokens
+from jsonstream import JsonFieldStream
+from ratelimit import get_rate_limiter
+from cassette import get_cassette
+from metrics import OPENAI_REQUEST_SECONDS, OPENAI_TOKENS, OPENAI_ERRORS, LLM_CACHE_LOOKUPS
+
+MODEL = "gpt-4o"
+MAX_TOKENS = 2000
+TEMPERATURE = 0.7
+# Bump when a prompt changes so cached analyses made with the old prompt are not reused
+PROMPT_VERSION = "1"
+
+# Characters per token event when a streamed reply is replayed from the cassette
+REPLAY_PIECE_CHARS = 16
+
+# Tokens an image counts against the tokens/min limit by detail level (high: upper bound after downscaling)
+IMAGE_TOKENS = {"low": 85, "high": 1105}
 
-# Initialize OpenAI client
 if USE_PROXY:
     # Using proxy API
-    client = openai.OpenAI(
-        api_key=PROXY_API_KEY,
-        base_url=PROXY_API_URL
-    )
+    CLIENT_OPTIONS = {"api_key": PROXY_API_KEY, "base_url": PROXY_API_URL}
 else:
     # Using direct OpenAI API
-    client = openai.OpenAI(api_key=OPENAI_API_KEY)
+    CLIENT_OPTIONS = {"api_key": OPENAI_API_KEY}
+# Retries are done by the shared rate limiter, which knows about all requests in flight
+CLIENT_OPTIONS["max_retries"] = 0
 
+# Initialize OpenAI client
+client = openai.OpenAI(**CLIENT_OPTIONS)
 
-def analyze_image(image_path: str) -> Dict[str, Any]:
-    """
-    Analyze an image and return detailed competitor analysis with design scores
-    """
-    with open(image_path, "rb") as image_file:
-        image_base64 = base64.b64encode(image_file.read()).decode('utf-8')
-    
-    prompt = """Analyze this competitor's visual content and provide a comprehensive analysis in JSON format.
+# Async client is created on first use inside the running event loop
+_async_client: Optional[openai.AsyncOpenAI] = None
+
+
+IMAGE_PROMPT = """Analyze this competitor's visual content and provide a comprehensive analysis in JSON format.
     Focus on:
     1. Visual design quality and aesthetics (design_score: 0-10)
     2. Animation potential and motion design opportunities (animation_potential: 0-10)
@@ -49,60 +74,7 @@ def analyze_image(image_path: str) -> Dict[str, Any]:
     
     Be specific and provide actionable insights."""
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=2000,
-            temperature=0.7
-        )
-        
-        content = response.choices[0].message.content
-        
-        # Extract JSON from response
-        json_start = content.find('{')
-        json_end = content.rfind('}') + 1
-        if json_start != -1 and json_end > json_start:
-            json_str = content[json_start:json_end]
-            result = json.loads(json_str)
-        else:
-            # Fallback: try to parse entire content
-            result = json.loads(content)
-        
-        return {
-            "success": True,
-            "analysis": result,
-            "raw_response": content
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e),
-            "analysis": None
-        }
-
-
-def analyze_text(text_content: str) -> Dict[str, Any]:
-    """
-    Analyze text content and return detailed competitor analysis
-    """
-    prompt = """Analyze this competitor's text content and provide a comprehensive analysis in JSON format.
+TEXT_PROMPT = """Analyze this competitor's text content and provide a comprehensive analysis in JSON format.
     Focus on:
     1. Content quality and messaging effectiveness (design_score: 0-10 for overall presentation)
     2. Animation potential in content delivery and storytelling (animation_potential: 0-10)
@@ -131,34 +103,601 @@ def analyze_text(text_content: str) -> Dict[str, Any]:
     Be specific and provide actionable insights.
     
     Text content to analyze:
-    """ + text_content
+    """
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            max_tokens=2000,
-            temperature=0.7,
-            response_format={"type": "json_object"}
+REDUCE_PROMPT = """Below are {count} partial analyses of consecutive sections of the same competitor's text content.
+    Merge them into a single analysis of the whole text.
+    Return one JSON object with exactly the same keys and value types as the partial analyses.
+    Scores must reflect the text as a whole, lists must be deduplicated and keep the most important items first,
+    and descriptions must summarize all sections rather than repeat them.
+    
+    Partial analyses:
+    """
+
+
+def build_image_request(image_bytes: bytes, mime_type: str = "image/jpeg",
+                        detail: Optional[str] = None) -> Dict[str, Any]:
+    """Chat completion arguments for an image analysis"""
+    image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+    image_url = {"url": f"data:{mime_type};base64,{image_base64}"}
+    if detail:
+        image_url["detail"] = detail
+    return {
+        "model": MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": IMAGE_PROMPT
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": image_url
+                    }
+                ]
+            }
+        ],
+        "max_tokens": MAX_TOKENS,
+        "temperature": TEMPERATURE
+    }
+
+
+def prepare_image_request(image_bytes: bytes) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Preprocess the image (when IMAGE_PREPROCESS is on) and build the request.
+    Returns (request arguments, preprocessing stats).
+    """
+    if not IMAGE_PREPROCESS:
+        return build_image_request(image_bytes), {}
+    data, mime_type, detail, stats = preprocess_image(image_bytes)
+    return build_image_request(data, mime_type, detail), stats
+
+
+def build_text_request(text_content: str) -> Dict[str, Any]:
+    """Chat completion arguments for a text analysis"""
+    return {
+        "model": MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": TEXT_PROMPT + text_content
+            }
+        ],
+        "max_tokens": MAX_TOKENS,
+        "temperature": TEMPERATURE,
+        "response_format": {"type": "json_object"}
+    }
+
+
+def build_reduce_request(analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Chat completion arguments merging per-chunk text analyses into one"""
+    return {
+        "model": MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": REDUCE_PROMPT.format(count=len(analyses)) + json.dumps(analyses, ensure_ascii=False)
+            }
+        ],
+        "max_tokens": MAX_TOKENS,
+        "temperature": TEMPERATURE,
+        "response_format": {"type": "json_object"}
+    }
+
+
+def request_tokens(request: Dict[str, Any]) -> int:
+    """
+    Tokens reserved against the tokens/min limit: prompt estimate plus the
+    expected completion, capped by max_tokens. Usage in the reply settles it.
+    """
+    tokens = min(request.get("max_tokens", OPENAI_COMPLETION_ESTIMATE), OPENAI_COMPLETION_ESTIMATE)
+    for message in request["messages"]:
+        content = message["content"]
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content}]
+        for part in parts:
+            if part["type"] == "text":
+                tokens += estimate_tokens(part["text"])
+            elif part["type"] == "image_url":
+                tokens += IMAGE_TOKENS.get(part["image_url"].get("detail"), IMAGE_TOKENS["high"])
+    return tokens
+
+
+def parse_image_content(content: str) -> Dict[str, Any]:
+    """Extract the JSON object from a free-form image analysis reply"""
+    json_start = content.find('{')
+    json_end = content.rfind('}') + 1
+    if json_start != -1 and json_end > json_start:
+        json_str = content[json_start:json_end]
+        return json.loads(json_str)
+    # Fallback: try to parse entire content
+    return json.loads(content)
+
+
+def _cache_key(kind: str, content: bytes) -> Optional[str]:
+    if not LLM_CACHE_ENABLED:
+        return None
+    return make_key(MODEL, PROMPT_VERSION, TEMPERATURE, kind, content)
+
+
+def _image_cache_key(image_bytes: bytes) -> Optional[str]:
+    # Preprocessing settings change what the model sees, so they are part of the key
+    kind = f"image:{IMAGE_MAX_EDGE}:{IMAGE_JPEG_QUALITY}:{IMAGE_DETAIL}" if IMAGE_PREPROCESS else "image"
+    return _cache_key(kind, image_bytes)
+
+
+def _chunked_text_cache_key(text_content: str) -> Optional[str]:
+    # The chunk budget and reduce fan-in change what the reduce steps see
+    return _cache_key(f"text:chunked:{TEXT_CHUNK_TOKENS}:fanin{TEXT_REDUCE_FANIN}", text_content.encode("utf-8"))
+
+
+def _cached_result(key: Optional[str], use_cache: bool) -> Optional[Dict[str, Any]]:
+    if key is None or not use_cache:
+        return None
+    cached = get_llm_cache().get(key)
+    if cached is None:
+        LLM_CACHE_LOOKUPS.labels("miss").inc()
+        return None
+    LLM_CACHE_LOOKUPS.labels("hit").inc()
+    return dict(cached, cached=True)
+
+
+def _store_result(key: Optional[str], result: Dict[str, Any]):
+    if key is not None and result.get("success"):
+        get_llm_cache().put(key, result)
+
+
+# The disk tier of the cache reads and writes files (and put() may scan the directory
+# to evict), so the event loop hands cache access to a worker thread
+async def _cached_result_async(key: Optional[str], use_cache: bool) -> Optional[Dict[str, Any]]:
+    if key is None or not use_cache:
+        return None
+    return await asyncio.to_thread(_cached_result, key, use_cache)
+
+
+async def _store_result_async(key: Optional[str], result: Dict[str, Any]):
+    if key is not None and result.get("success"):
+        await asyncio.to_thread(_store_result, key, result)
+
+
+def success_result(analysis: Dict[str, Any], content: str) -> Dict[str, Any]:
+    return {
+        "success": True,
+        "analysis": analysis,
+        "raw_response": content
+    }
+
+
+def failure_result(error: Exception) -> Dict[str, Any]:
+    return {
+        "success": False,
+        "error": str(error),
+        "analysis": None
+    }
+
+
+def read_image(image: Union[str, bytes]) -> bytes:
+    """Image bytes from raw bytes or a file path"""
+    if isinstance(image, (bytes, bytearray)):
+        return bytes(image)
+    with open(image, "rb") as image_file:
+        return image_file.read()
+
+
+def get_async_client() -> openai.AsyncOpenAI:
+    """Shared AsyncOpenAI client with a pooled keep-alive HTTP connection pool"""
+    global _async_client
+    if _async_client is None:
+        http_client = openai.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS,
+                                max_keepalive_connections=OPENAI_MAX_CONNECTIONS),
+            timeout=OPENAI_TIMEOUT
         )
-        
+        _async_client = openai.AsyncOpenAI(http_client=http_client, **CLIENT_OPTIONS)
+    return _async_client
+
+
+async def close_async_client():
+    """Close the shared async client and its connection pool"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+    _async_client = None
+
+
+def _record_call(kind: str, started: float, response=None, error: Optional[Exception] = None):
+    """Metrics of one completion: latency, token usage and errors by type"""
+    OPENAI_REQUEST_SECONDS.labels(kind).observe(time.perf_counter() - started)
+    if error is not None:
+        OPENAI_ERRORS.labels(kind, type(error).__name__).inc()
+        return
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        OPENAI_TOKENS.labels(kind, "prompt").inc(usage.prompt_tokens or 0)
+        OPENAI_TOKENS.labels(kind, "completion").inc(usage.completion_tokens or 0)
+
+
+def complete(request: Dict[str, Any], kind: str = "text"):
+    """
+    Chat completion within the shared rate limits, retrying retriable errors.
+    Replayed from (or recorded to) the cassette when OPENAI_CASSETTE_MODE is set.
+    """
+    started = time.perf_counter()
+    cassette = get_cassette()
+    try:
+        if cassette is not None and cassette.replaying:
+            response, delay = cassette.replay(request)
+            time.sleep(delay)
+        else:
+            response = get_rate_limiter().call(lambda: client.chat.completions.with_raw_response.create(**request),
+                                               request_tokens(request))
+    except Exception as e:
+        _record_call(kind, started, error=e)
+        raise
+    _record_call(kind, started, response)
+    if cassette is not None and cassette.recording:
+        cassette.record(request, response, time.perf_counter() - started)
+    return response
+
+
+async def complete_async(request: Dict[str, Any], kind: str = "text"):
+    """Non-blocking complete()"""
+    started = time.perf_counter()
+    cassette = get_cassette()
+    try:
+        if cassette is not None and cassette.replaying:
+            response, delay = cassette.replay(request)
+            await asyncio.sleep(delay)
+        else:
+            response = await get_rate_limiter().call_async(
+                lambda: get_async_client().chat.completions.with_raw_response.create(**request),
+                request_tokens(request)
+            )
+    except Exception as e:
+        _record_call(kind, started, error=e)
+        raise
+    _record_call(kind, started, response)
+    if cassette is not None and cassette.recording:
+        await asyncio.to_thread(cassette.record, request, response, time.perf_counter() - started)
+    return response
+
+
+async def stream_completion(request: Dict[str, Any], kind: str = "text_stream") -> AsyncIterator[str]:
+    """
+    Text pieces of a streamed chat completion, within the shared rate limits.
+    Only a stream that has not produced output yet is retried. Replayed
+    streams yield the recorded reply in small pieces.
+    """
+    started = time.perf_counter()
+    cassette = get_cassette()
+    if cassette is not None and cassette.replaying:
+        try:
+            response, delay = cassette.replay(request)
+        except Exception as e:
+            _record_call(kind, started, error=e)
+            raise
+        content = response.choices[0].message.content or ""
+        pieces = [content[i:i + REPLAY_PIECE_CHARS] for i in range(0, len(content), REPLAY_PIECE_CHARS)]
+        for piece in pieces:
+            if delay:
+                await asyncio.sleep(delay / len(pieces))
+            yield piece
+        _record_call(kind, started, response)
+        return
+
+    limiter = get_rate_limiter()
+    parts = []
+    attempt = 0
+    while True:
+        try:
+            async with limiter.slot_async(request_tokens(request)) as slot:
+                raw = await get_async_client().chat.completions.with_raw_response.create(**request, stream=True)
+                slot.observe(raw.headers)
+                stream = raw.parse()
+                async with stream:
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+            break
+        except Exception as e:
+            delay = None if parts else limiter.retry_delay(e, attempt)
+            if delay is None:
+                _record_call(kind, started, error=e)
+                raise
+        attempt += 1
+        await asyncio.sleep(delay)
+    _record_call(kind, started)
+    if cassette is not None and cassette.recording:
+        await asyncio.to_thread(cassette.record_content, request, "".join(parts), time.perf_counter() - started)
+
+
+def analyze_image(image: Union[str, bytes], use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Analyze an image (file path or raw bytes) and return detailed competitor
+    analysis with design scores
+    """
+    image_bytes = read_image(image)
+
+    key = _image_cache_key(image_bytes)
+    cached = _cached_result(key, use_cache)
+    if cached is not None:
+        return cached
+
+    try:
+        request, preprocessing = prepare_image_request(image_bytes)
+        response = complete(request, kind="image")
+
+        content = response.choices[0].message.content
+        result = success_result(parse_image_content(content), content)
+        result["preprocessing"] = preprocessing
+    except Exception as e:
+        return failure_result(e)
+
+    _store_result(key, result)
+    return result
+
+
+def analyze_text(text_content: str, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Analyze text content and return detailed competitor analysis.
+    Text over TEXT_CHUNK_TOKENS is analyzed in chunks and the results merged.
+    """
+    chunks = split_text(text_content, TEXT_CHUNK_TOKENS)
+    if len(chunks) > 1:
+        return _analyze_text_chunked(text_content, chunks, use_cache)
+    return _analyze_text_single(text_content, use_cache)
+
+
+def _analyze_text_single(text_content: str, use_cache: bool) -> Dict[str, Any]:
+    key = _cache_key("text", text_content.encode("utf-8"))
+    cached = _cached_result(key, use_cache)
+    if cached is not None:
+        return cached
+
+    try:
+        response = complete(build_text_request(text_content))
+
+        content = response.choices[0].message.content
+        result = success_result(json.loads(content), content)
+    except Exception as e:
+        return failure_result(e)
+
+    _store_result(key, result)
+    return result
+
+
+def _analyze_text_chunked(text_content: str, chunks: List[str], use_cache: bool) -> Dict[str, Any]:
+    """
+    Map: analyze every chunk, TEXT_CHUNK_CONCURRENCY at a time. Reduce: merge
+    them in one more call (in rounds of TEXT_REDUCE_FANIN when there are more).
+    """
+    key = _chunked_text_cache_key(text_content)
+    cached = _cached_result(key, use_cache)
+    if cached is not None:
+        return cached
+
+    with ThreadPoolExecutor(max_workers=min(len(chunks), TEXT_CHUNK_CONCURRENCY)) as executor:
+        partials = list(executor.map(lambda chunk: _analyze_text_single(chunk, use_cache), chunks))
+
+    analyses = [partial["analysis"] for partial in partials if partial.get("success")]
+    if not analyses:
+        return failure_result(RuntimeError(partials[0].get("error", "All chunk analyses failed")))
+
+    try:
+        merged, rounds = _reduce_rounds(analyses)
+        response = complete(build_reduce_request(merged), kind="reduce")
+
+        content = response.choices[0].message.content
+        result = success_result(json.loads(content), content)
+    except Exception as e:
+        return failure_result(e)
+
+    result["chunking"] = _chunking_info(text_content, chunks, analyses, rounds + 1)
+    _store_result(key, result)
+    return result
+
+
+def _reduce_group(analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if len(analyses) == 1:
+        return analyses[0]
+    response = complete(build_reduce_request(analyses), kind="reduce")
+    return json.loads(response.choices[0].message.content)
+
+
+def _reduce_rounds(analyses: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Merge groups of TEXT_REDUCE_FANIN analyses until one request can take them all; returns (analyses, rounds)"""
+    rounds = 0
+    while len(analyses) > TEXT_REDUCE_FANIN:
+        groups = [analyses[start:start + TEXT_REDUCE_FANIN] for start in range(0, len(analyses), TEXT_REDUCE_FANIN)]
+        with ThreadPoolExecutor(max_workers=min(len(groups), TEXT_CHUNK_CONCURRENCY)) as executor:
+            analyses = list(executor.map(_reduce_group, groups))
+        rounds += 1
+    return analyses, rounds
+
+
+def _chunking_info(text_content: str, chunks: List[str], analyses: List[Dict[str, Any]],
+                   reduce_rounds: int) -> Dict[str, Any]:
+    return {
+        "tokens": estimate_tokens(text_content),
+        "chunks": len(chunks),
+        "analyzed": len(analyses),
+        "failed": len(chunks) - len(analyses),
+        "reduce_rounds": reduce_rounds
+    }
+
+
+async def analyze_image_async(image: Union[str, bytes], use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Non-blocking analyze_image() for use inside the event loop
+    """
+    if isinstance(image, (bytes, bytearray)):
+        image_bytes = bytes(image)
+    else:
+        image_bytes = await asyncio.to_thread(read_image, image)
+
+    key = _image_cache_key(image_bytes)
+    cached = await _cached_result_async(key, use_cache)
+    if cached is not None:
+        return cached
+
+    try:
+        request, preprocessing = await asyncio.to_thread(prepare_image_request, image_bytes)
+        response = await complete_async(request, kind="image")
+
         content = response.choices[0].message.content
-        result = json.loads(content)
-        
-        return {
-            "success": True,
-            "analysis": result,
-            "raw_response": content
-        }
+        result = success_result(parse_image_content(content), content)
+        result["preprocessing"] = preprocessing
     except Exception as e:
-        return {
-            "success": False,
-            "error": str(e),
-            "analysis": None
-        }
+        return failure_result(e)
+
+    await _store_result_async(key, result)
+    return result
+
+
+async def analyze_text_async(text_content: str, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Non-blocking analyze_text() for use inside the event loop
+    """
+    chunks = split_text(text_content, TEXT_CHUNK_TOKENS)
+    if len(chunks) > 1:
+        return await _analyze_text_chunked_async(text_content, chunks, use_cache)
+    return await _analyze_text_single_async(text_content, use_cache)
+
+
+async def _analyze_text_single_async(text_content: str, use_cache: bool) -> Dict[str, Any]:
+    key = _cache_key("text", text_content.encode("utf-8"))
+    cached = await _cached_result_async(key, use_cache)
+    if cached is not None:
+        return cached
+
+    try:
+        response = await complete_async(build_text_request(text_content))
+
+        content = response.choices[0].message.content
+        result = success_result(json.loads(content), content)
+    except Exception as e:
+        return failure_result(e)
+
+    await _store_result_async(key, result)
+    return result
+
+
+async def _map_chunks_async(chunks: List[str], use_cache: bool) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Analyze every chunk, TEXT_CHUNK_CONCURRENCY at a time; returns (partial results, successful analyses)"""
+    semaphore = asyncio.Semaphore(TEXT_CHUNK_CONCURRENCY)
+
+    async def analyze(chunk: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await _analyze_text_single_async(chunk, use_cache)
+
+    partials = await asyncio.gather(*(analyze(chunk) for chunk in chunks))
+    analyses = [partial["analysis"] for partial in partials if partial.get("success")]
+    return partials, analyses
+
+
+async def _reduce_group_async(analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if len(analyses) == 1:
+        return analyses[0]
+    response = await complete_async(build_reduce_request(analyses), kind="reduce")
+    return json.loads(response.choices[0].message.content)
+
+
+async def _reduce_rounds_async(analyses: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """_reduce_rounds() for the event loop"""
+    rounds = 0
+    while len(analyses) > TEXT_REDUCE_FANIN:
+        groups = [analyses[start:start + TEXT_REDUCE_FANIN] for start in range(0, len(analyses), TEXT_REDUCE_FANIN)]
+        analyses = list(await asyncio.gather(*(_reduce_group_async(group) for group in groups)))
+        rounds += 1
+    return analyses, rounds
+
+
+async def _analyze_text_chunked_async(text_content: str, chunks: List[str], use_cache: bool) -> Dict[str, Any]:
+    key = _chunked_text_cache_key(text_content)
+    cached = await _cached_result_async(key, use_cache)
+    if cached is not None:
+        return cached
+
+    partials, analyses = await _map_chunks_async(chunks, use_cache)
+    if not analyses:
+        return failure_result(RuntimeError(partials[0].get("error", "All chunk analyses failed")))
+
+    try:
+        merged, rounds = await _reduce_rounds_async(analyses)
+        response = await complete_async(build_reduce_request(merged), kind="reduce")
+
+        content = response.choices[0].message.content
+        result = success_result(json.loads(content), content)
+    except Exception as e:
+        return failure_result(e)
+
+    result["chunking"] = _chunking_info(text_content, chunks, analyses, rounds + 1)
+    await _store_result_async(key, result)
+    return result
+
+
+async def analyze_text_stream(text_content: str, use_cache: bool = True) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streaming analyze_text_async(). Yields (event, data) pairs: "token" with
+    each piece of model output, "field" as each top-level field of the analysis
+    completes, "chunks" once the chunks of a long text are analyzed (its reduce
+    step is what streams) and finally "done" with the analyze_text_async() result.
+    """
+    chunks = split_text(text_content, TEXT_CHUNK_TOKENS)
+    chunked = len(chunks) > 1
+    key = _chunked_text_cache_key(text_content) if chunked else _cache_key("text", text_content.encode("utf-8"))
+    cached = await _cached_result_async(key, use_cache)
+    if cached is not None:
+        for name, value in (cached.get("analysis") or {}).items():
+            yield "field", {"name": name, "value": value}
+        yield "done", cached
+        return
+
+    if chunked:
+        partials, analyses = await _map_chunks_async(chunks, use_cache)
+        yield "chunks", {"total": len(chunks), "analyzed": len(analyses), "failed": len(chunks) - len(analyses)}
+        if not analyses:
+            yield "done", failure_result(RuntimeError(partials[0].get("error", "All chunk analyses failed")))
+            return
+        try:
+            merged, rounds = await _reduce_rounds_async(analyses)
+        except Exception as e:
+            yield "done", failure_result(e)
+            return
+        request = build_reduce_request(merged)
+    else:
+        request = build_text_request(text_content)
+
+    fields = JsonFieldStream()
+    parts = []
+    try:
+        async for delta in stream_completion(request, kind="reduce_stream" if chunked else "text_stream"):
+            parts.append(delta)
+            yield "token", {"text": delta}
+            for name, value in fields.feed(delta):
+                yield "field", {"name": name, "value": value}
+
+        content = "".join(parts)
+        result = success_result(json.loads(content), content)
+    except Exception as e:
+        yield "done", failure_result(e)
+        return
+
+    if chunked:
+        result["chunking"] = _chunking_info(text_content, chunks, analyses, rounds + 1)
+    await _store_result_async(key, result)
+    yield "done", result
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of the analysis cache"""
+    stats = get_llm_cache().stats() if LLM_CACHE_ENABLED else {}
+    return dict(stats, enabled=LLM_CACHE_ENABLED)
+
 
+def get_rate_limit_stats() -> Dict[str, Any]:
+    """Limits, adaptive concurrency and retry counters of the shared rate limiter"""
+    return get_rate_limiter().stats()
@@ -0,0 +1,124 @@
+"""Per-URL cache of parsed pages for conditional re-fetch and unchanged-content skips"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from config import PAGE_CACHE_FILE, PAGE_CACHE_TTL, PAGE_CACHE_MAX_ENTRIES
+
+# Markup that changes between identical page views (nonces, inline state, timestamps
+# in comments) and should not make a page look modified
+_VOLATILE_MARKUP = re.compile(
+    r"<script\b[^>]*>.*?</script\s*>|<style\b[^>]*>.*?</style\s*>|<!--.*?-->",
+    re.IGNORECASE | re.DOTALL
+)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def content_hash(page_source: str) -> str:
+    """Hash of the HTML with scripts, styles, comments and whitespace runs normalized away"""
+    normalized = _WHITESPACE.sub(" ", _VOLATILE_MARKUP.sub("", page_source)).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """
+    LRU map of url -> {etag, last_modified, http_hash, content_hash, data, stored_at}.
+
+    Entries expire after `ttl` seconds and the least recently used entries are
+    evicted beyond `max_entries`. The cache is persisted as one JSON file.
+    """
+
+    def __init__(self, path: Optional[str] = PAGE_CACHE_FILE, ttl: float = PAGE_CACHE_TTL,
+                 max_entries: int = PAGE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # One writer at a time, so saves land in snapshot order
+        self._dirty = False
+        self.load()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for `url` unless it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            if time.time() - entry["stored_at"] > self.ttl:
+                del self._entries[url]
+                self._dirty = True
+                return None
+            self._entries.move_to_end(url)
+            return entry
+
+    def put(self, url: str, **fields):
+        """Store a fresh entry for `url`, evicting the least recently used ones"""
+        with self._lock:
+            self._entries[url] = dict(fields, stored_at=time.time())
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def load(self):
+        """Load persisted entries, dropping expired ones"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable page cache {self.path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for url, entry in entries.items():
+                if now - entry.get("stored_at", 0) <= self.ttl:
+                    self._entries[url] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self):
+        """Persist entries if anything changed since the last save"""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                snapshot = dict(self._entries)
+                self._dirty = False
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            tmp = tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".tmp", delete=False)
+            try:
+                with tmp:
+                    json.dump(snapshot, tmp, ensure_ascii=False)
+                os.replace(tmp.name, self.path)
+            except BaseException:
+                os.remove(tmp.name)
+                with self._lock:
+                    self._dirty = True
+                raise
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_page_cache: Optional[PageCache] = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache:
+    """Get or create the process-wide page cache"""
+    global _page_cache
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache()
+        return _page_cache
@@ -0,0 +1,153 @@
+"""Structural diff of parsed pages against the last stored parsing run"""
+import asyncio
+import difflib
+import hashlib
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from historystore import HistoryStore, PARSING_TYPE, get_history_store
+from openaiservice import analyze_text_async
+
+SECTIONS = ("headings", "links", "images", "keywords", "text_content")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+def section_hashes(data: Dict[str, Any]) -> Dict[str, str]:
+    """Short hash of every section of extracted page data"""
+    return {section: hashlib.sha256(_canonical(data.get(section)).encode("utf-8")).hexdigest()[:16]
+            for section in SECTIONS}
+
+
+def _items(section: str, value: Any) -> List[Any]:
+    """A section as a flat list of comparable items"""
+    if not value:
+        return []
+    if section == "headings":
+        return [{"level": level, "text": text} for level, texts in value.items() for text in texts]
+    if section == "text_content":
+        # Whitespace-insensitive, so runs stored before page text kept line breaks compare equal
+        return [" ".join(sentence.split()) for sentence in _SENTENCE_END.split(value) if sentence]
+    return list(value)
+
+
+def _diff_sentences(old: List[str], new: List[str]) -> Dict[str, List[str]]:
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    added, removed = [], []
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag in ("replace", "delete"):
+            removed.extend(old[old_start:old_end])
+        if tag in ("replace", "insert"):
+            added.extend(new[new_start:new_end])
+    return {"added": added, "removed": removed}
+
+
+def _diff_items(old: List[Any], new: List[Any]) -> Dict[str, List[Any]]:
+    old_keys = {_canonical(item) for item in old}
+    new_keys = {_canonical(item) for item in new}
+    return {"added": [item for item in new if _canonical(item) not in old_keys],
+            "removed": [item for item in old if _canonical(item) not in new_keys]}
+
+
+def diff_page(previous: Dict[str, Any], current: Dict[str, Any],
+              previous_hashes: Optional[Dict[str, str]] = None,
+              current_hashes: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, List[Any]]]:
+    """Added/removed items of every section whose hash changed"""
+    previous_hashes = previous_hashes or section_hashes(previous)
+    current_hashes = current_hashes or section_hashes(current)
+    changes = {}
+    for section in SECTIONS:
+        if previous_hashes.get(section) == current_hashes[section]:
+            continue
+        old, new = _items(section, previous.get(section)), _items(section, current.get(section))
+        diff = _diff_sentences(old, new) if section == "text_content" else _diff_items(old, new)
+        if diff["added"] or diff["removed"]:
+            changes[section] = diff
+    return changes
+
+
+def diff_results(results: List[Dict[str, Any]], store: Optional[HistoryStore] = None) -> List[Dict[str, Any]]:
+    """
+    Compare each successful result with the last stored successful parse of
+    its URL. Call before the run itself is saved. Adds "section_hashes" to
+    the results (stored with them for the next comparison) and returns one
+    change set per URL with status new, changed, unchanged or failed.
+    """
+    store = store or get_history_store()
+    change_sets = []
+    for result in results:
+        change = {"url": result.get("url"), "status": "failed", "sections": {}}
+        change_sets.append(change)
+        if not result.get("success"):
+            continue
+        result["section_hashes"] = section_hashes(result.get("data") or {})
+
+        previous = store.latest(PARSING_TYPE, ref=result.get("url"), success=True)
+        if previous is None:
+            change["status"] = "new"
+            continue
+        payload = previous["payload"]
+        change.update(previous_id=previous["id"], previous_timestamp=previous["timestamp"])
+        change["sections"] = diff_page(payload.get("data") or {}, result.get("data") or {},
+                                       payload.get("section_hashes"), result["section_hashes"])
+        change["status"] = "changed" if change["sections"] else "unchanged"
+    return change_sets
+
+
+def change_text(change: Dict[str, Any]) -> str:
+    """What was added to a page, as text for analyze_text(); empty when nothing new appeared"""
+    sections = change.get("sections") or {}
+    parts = []
+    headings = (sections.get("headings") or {}).get("added")
+    if headings:
+        parts.append("New headings:\n" + "\n".join(f"{h['level']}: {h['text']}" for h in headings))
+    keywords = (sections.get("keywords") or {}).get("added")
+    if keywords:
+        parts.append("New meta keywords: " + ", ".join(keywords))
+    links = (sections.get("links") or {}).get("added")
+    if links:
+        parts.append("New links:\n" + "\n".join(f"{link['text']} ({link['url']})" for link in links))
+    images = (sections.get("images") or {}).get("added")
+    if images:
+        parts.append("New images:\n" + "\n".join(image.get("alt") or image.get("src", "") for image in images))
+    text = (sections.get("text_content") or {}).get("added")
+    if text:
+        parts.append("New text:\n" + " ".join(text))
+    if not parts:
+        return ""
+    return f"Content that changed on {change['url']} since {change.get('previous_timestamp')}:\n\n" + "\n\n".join(parts)
+
+
+async def analyze_changes_async(change_sets: List[Dict[str, Any]], use_cache: bool = True) -> List[Dict[str, Any]]:
+    """
+    Analyze only what changed: the new content of every changed page goes to
+    analyze_text and its result is stored under "analysis" of the change set.
+    Returns the change sets that were analyzed.
+    """
+    pending = [(change, change_text(change)) for change in change_sets if change["status"] == "changed"]
+    pending = [(change, text) for change, text in pending if text]
+    results = await asyncio.gather(*(analyze_text_async(text, use_cache=use_cache) for _, text in pending))
+    for (change, _), result in zip(pending, results):
+        change["analysis"] = result
+    return [change for change, _ in pending]
+
+
+async def reanalyze_changes(change_sets: List[Dict[str, Any]], run_id: str, use_cache: bool = True) -> int:
+    """analyze_changes_async() and store every analysis as a change_analysis history record"""
+    analyzed = await analyze_changes_async(change_sets, use_cache=use_cache)
+    for change in analyzed:
+        history_entry = {
+            "type": "change_analysis",
+            "timestamp": datetime.now().isoformat(),
+            "url": change["url"],
+            "run_id": run_id,
+            "changes": change["sections"],
+            "result": change["analysis"]
+        }
+        await asyncio.to_thread(get_history_store().add, history_entry)
+    return len(analyzed)
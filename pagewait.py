@@ -0,0 +1,86 @@
+"""Page readiness strategies used after driver.get() instead of a fixed sleep"""
+import time
+from typing import Any, Callable, Dict, Optional
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+from config import PAGE_READY_STRATEGY, PAGE_READY_TIMEOUT, PAGE_QUIET_WINDOW
+
+POLL_INTERVAL = 0.1
+
+_DOM_SIGNATURE_JS = (
+    "return document.getElementsByTagName('*').length + ':' + "
+    "(document.body ? document.body.textContent.length : 0);"
+)
+_RESOURCE_COUNT_JS = "return performance.getEntriesByType('resource').length;"
+
+
+def _document_complete(driver) -> bool:
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+def _quiet_for(probe: Callable[[Any], Any], quiet_window: float,
+               precondition: Optional[Callable[[Any], bool]] = None):
+    """
+    Build a wait condition that holds once `probe(driver)` has returned the
+    same value for `quiet_window` seconds.
+    """
+    state = {"value": None, "since": None}
+
+    def condition(driver) -> bool:
+        if precondition and not precondition(driver):
+            state["since"] = None
+            return False
+        value = probe(driver)
+        now = time.monotonic()
+        if state["since"] is None or value != state["value"]:
+            state["value"], state["since"] = value, now
+            return False
+        return now - state["since"] >= quiet_window
+
+    return condition
+
+
+def _condition(strategy: str, selector: Optional[str], quiet_window: float):
+    if strategy == "ready_state":
+        return _document_complete
+    if strategy == "selector":
+        if not selector:
+            raise ValueError("The 'selector' readiness strategy requires a CSS selector")
+        return EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+    if strategy == "dom_stable":
+        return _quiet_for(lambda d: d.execute_script(_DOM_SIGNATURE_JS), quiet_window)
+    if strategy == "network_idle":
+        return _quiet_for(lambda d: d.execute_script(_RESOURCE_COUNT_JS), quiet_window,
+                          precondition=_document_complete)
+    raise ValueError(f"Unknown readiness strategy: {strategy}")
+
+
+def wait_for_page(driver, settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Wait until the loaded page is ready according to the site's strategy.
+
+    `settings` may contain "wait" (ready_state, selector, dom_stable or
+    network_idle), "selector", "wait_timeout" and "quiet_window". The wait
+    never exceeds the timeout; a page that is still not ready by then is
+    parsed as-is and reported with ready=False.
+    """
+    settings = settings or {}
+    strategy = settings.get("wait", PAGE_READY_STRATEGY)
+    timeout = settings.get("wait_timeout", PAGE_READY_TIMEOUT)
+    condition = _condition(strategy, settings.get("selector"),
+                           settings.get("quiet_window", PAGE_QUIET_WINDOW))
+
+    started = time.perf_counter()
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(condition)
+        ready = True
+    except TimeoutException:
+        ready = False
+
+    return {
+        "strategy": strategy,
+        "ready": ready,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
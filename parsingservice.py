@@ -1,160 +1,358 @@
-"""Selenium-based parsing service for competitor websites"""
+"""HTTP/Selenium parsing service for competitor websites"""
+import codecs
 import time
-import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from urllib.parse import urlparse
+from typing import Callable, Dict, List, Any, Optional
 from selenium.common.exceptions import TimeoutException, WebDriverException
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
 import requests
-from config import COMPETITOR_URLS, SELENIUM_HEADLESS, SELENIUM_TIMEOUT, HISTORY_DIR
-import os
+from config import (
+    COMPETITOR_URLS, PARSING_CONCURRENT, PARSING_MAX_WORKERS,
+    PARSING_HOST_DELAY, SITE_SETTINGS, FETCH_TIER, HTTP_TIMEOUT, HTTP_POOL_SIZE,
+    HTTP_MIN_TEXT_LENGTH, USER_AGENT, PAGE_CACHE_ENABLED, FETCH_PROFILE
+)
+from driverpool import DriverPool, get_driver_pool, drain_network_log
+from pagewait import wait_for_page
+from extraction import extract_page_data
+from pagecache import PageCache, content_hash, get_page_cache
+from historystore import get_history_store
+from metrics import PARSER_STAGE_SECONDS
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+# Metric children resolved once, so recording a stage is a single observe()
+_HTTP_FETCH_SECONDS = PARSER_STAGE_SECONDS.labels("http_fetch")
+_DRIVER_LEASE_SECONDS = PARSER_STAGE_SECONDS.labels("driver_lease")
+_PAGE_LOAD_SECONDS = PARSER_STAGE_SECONDS.labels("page_load")
+_WAIT_SECONDS = PARSER_STAGE_SECONDS.labels("wait")
+_EXTRACT_SECONDS = PARSER_STAGE_SECONDS.labels("extract")
+
+# Known client-side app mount points left empty in the server response
+_EMPTY_SPA_ROOT = re.compile(
+    r'<(?:div|main|section)[^>]+id=["\'](?:root|app|__next|__nuxt|___gatsby|svelte)["\'][^>]*>\s*</',
+    re.IGNORECASE
+)
+_HEADER_CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="...; charset=...">, within the first bytes
+_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+_META_SCAN_BYTES = 4096
+
+
+def get_site_settings(url: str) -> Dict[str, Any]:
+    """Per-site overrides from SITE_SETTINGS, matched by host (with or without www.)"""
+    host = urlparse(url).netloc.lower()
+    return SITE_SETTINGS.get(host) or SITE_SETTINGS.get(host.removeprefix("www."), {})
+
+
+def get_http_session() -> requests.Session:
+    """Process-wide requests session with a pooled, keep-alive connection adapter"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=HTTP_POOL_SIZE,
+                                                    pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _http_session = session
+        return _http_session
+
+
+def _known_codec(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def decode_html(response: requests.Response) -> str:
+    """
+    Text of an HTML response decoded with the charset of the Content-Type
+    header, else the page's <meta charset>, else the detected encoding.
+    (requests itself falls back to ISO-8859-1 for text/html without a charset.)
+    """
+    content = response.content
+    match = _HEADER_CHARSET.search(response.headers.get("Content-Type", ""))
+    encoding = _known_codec(match.group(1) if match else None)
+    if encoding is None:
+        match = _META_CHARSET.search(content[:_META_SCAN_BYTES])
+        encoding = _known_codec(match.group(1).decode("ascii", "ignore") if match else None)
+    if encoding is None:
+        encoding = _known_codec(response.apparent_encoding) or "utf-8"
+    return content.decode(encoding, errors="replace")
+
+
+def needs_javascript(page_source: str, data: Dict[str, Any]) -> bool:
+    """
+    Heuristic for server responses that only become meaningful after
+    client-side rendering: an empty SPA mount point or almost no body text.
+    """
+    if _EMPTY_SPA_ROOT.search(page_source):
+        return True
+    return len(data.get("text_content", "")) < HTTP_MIN_TEXT_LENGTH
+
+
+class HostThrottle:
+    """Enforce a minimum delay between consecutive requests to the same host"""
+
+    def __init__(self, delay: float = PARSING_HOST_DELAY):
+        self.delay = delay
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str, delay: Optional[float] = None):
+        """Block until the host of `url` may be requested again (`delay` overrides the default)"""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + (self.delay if delay is None else delay)
+        if slot > now:
+            time.sleep(slot - now)
 
 
 class ParsingService:
-    def __init__(self):
-        self.driver: Optional[webdriver.Chrome] = None
-        self.setup_driver()
+    def __init__(self, pool: Optional[DriverPool] = None, page_cache: Optional[PageCache] = None):
+        self.pool = pool  # None: the shared pool of each site's fetch profile
+        if page_cache is None and PAGE_CACHE_ENABLED:
+            page_cache = get_page_cache()
+        self.page_cache = page_cache
     
-    def setup_driver(self):
-        """Initialize Selenium WebDriver"""
-        chrome_options = Options()
-        if SELENIUM_HEADLESS:
-            chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-        
-        try:
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            self.driver.set_page_load_timeout(SELENIUM_TIMEOUT)
-        except Exception as e:
-            print(f"Error setting up driver: {e}")
-            raise
-    
-    def parse_url(self, url: str) -> Dict[str, Any]:
+    def parse_url(self, url: str, use_cache: bool = True) -> Dict[str, Any]:
         """
-        Parse a single URL and extract relevant data
+        Parse a single URL and extract relevant data.
+        Pages unchanged since the cached run return the cached data with unchanged=True.
         """
-        if not self.driver:
-            self.setup_driver()
-        
+        started = time.perf_counter()
+        settings = get_site_settings(url)
+        cached = self.page_cache.get(url) if (use_cache and self.page_cache is not None) else None
         result = {
             "url": url,
             "timestamp": datetime.now().isoformat(),
             "success": False,
-            "data": {}
+            "unchanged": False,
+            "data": {},
+            "timing": {}
         }
         
         try:
             print(f"Parsing URL: {url}")
-            self.driver.get(url)
-            time.sleep(3)  # Wait for dynamic content to load
+            tier = settings.get("tier", FETCH_TIER)
+            page_source = None
+            http_response = None
+            http_hash = None
             
-            # Get page source
-            page_source = self.driver.page_source
-            soup = BeautifulSoup(page_source, 'html.parser')
+            if tier in ("auto", "http"):
+                # The HTTP response of a page last rendered in Selenium is only its shell: an
+                # unchanged shell says nothing about the rendered content, so it is re-rendered
+                http_cached = cached is not None and cached.get("tier") == "http"
+                validators = cached if http_cached or tier == "auto" else None
+                try:
+                    http_response = self._fetch_http(url, result, validators)
+                except requests.RequestException as e:
+                    if tier == "http":
+                        raise
+                    print(f"HTTP fetch failed for {url}, falling back to Selenium: {e}")
+                else:
+                    result["final_url"] = http_response.url  # After redirects
+                    length = http_response.headers.get("Content-Length")
+                    result["transfer"] = {"bytes": int(length) if length and length.isdigit()
+                                          else len(http_response.content), "requests": 1, "blocked": 0}
+                    if http_response.status_code == 304:
+                        http_hash = cached.get("http_hash")
+                        unchanged = True
+                    else:
+                        page_source = decode_html(http_response)
+                        http_hash = content_hash(page_source)
+                        unchanged = validators is not None and validators.get("http_hash") == http_hash
+                    if unchanged and http_cached:
+                        return self._serve_cached(result, cached, started)
+                    if unchanged:
+                        # Still the same JavaScript shell: skip its extraction and render right away
+                        print(f"Page shell unchanged, rendering in Selenium: {url}")
+                        page_source = None
+                    else:
+                        result["data"] = self._extract(page_source, result)
+                        if tier == "auto" and needs_javascript(page_source, result["data"]):
+                            print(f"Page needs JavaScript, falling back to Selenium: {url}")
+                            page_source = None
+                        else:
+                            result["tier"] = "http"
             
-            # Extract key information
-            title = soup.find('title')
-            result["data"]["title"] = title.get_text().strip() if title else "No title"
-            
-            # Extract meta description
-            meta_desc = soup.find('meta', attrs={'name': 'description'})
-            result["data"]["meta_description"] = meta_desc.get('content', '') if meta_desc else ""
-            
-            # Extract headings
-            headings = {}
-            for i in range(1, 7):
-                h_tags = soup.find_all(f'h{i}')
-                headings[f'h{i}'] = [h.get_text().strip() for h in h_tags]
-            result["data"]["headings"] = headings
-            
-            # Extract main text content
-            main_content = soup.find('main') or soup.find('body')
-            if main_content:
-                # Remove script and style elements
-                for script in main_content(["script", "style"]):
-                    script.decompose()
-                text_content = main_content.get_text(separator=' ', strip=True)
-                result["data"]["text_content"] = text_content[:5000]  # Limit to 5000 chars
-            
-            # Extract links
-            links = []
-            for link in soup.find_all('a', href=True):
-                href = link.get('href')
-                text = link.get_text().strip()
-                if href and text:
-                    links.append({"url": href, "text": text[:100]})
-            result["data"]["links"] = links[:50]  # Limit to 50 links
-            
-            # Extract images
-            images = []
-            for img in soup.find_all('img', src=True):
-                src = img.get('src')
-                alt = img.get('alt', '')
-                if src:
-                    images.append({"src": src, "alt": alt})
-            result["data"]["images"] = images[:20]  # Limit to 20 images
-            
-            # Extract meta keywords
-            meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
-            if meta_keywords:
-                keywords = meta_keywords.get('content', '').split(',')
-                result["data"]["keywords"] = [k.strip() for k in keywords]
+            if page_source is None:
+                page_source = self._fetch_selenium(url, settings, result)
+                result["tier"] = "selenium"
+                if cached and cached.get("content_hash") == content_hash(page_source):
+                    return self._serve_cached(result, cached, started)
+                result["data"] = self._extract(page_source, result)
             
             result["success"] = True
             print(f"Successfully parsed: {url}")
             
+            if self.page_cache is not None:
+                headers = http_response.headers if http_response is not None else {}
+                self.page_cache.put(
+                    url,
+                    etag=headers.get("ETag"),
+                    last_modified=headers.get("Last-Modified"),
+                    http_hash=http_hash,
+                    content_hash=http_hash if result["tier"] == "http" else content_hash(page_source),
+                    tier=result["tier"],
+                    data=result["data"]
+                )
+            
         except TimeoutException:
             result["error"] = "Page load timeout"
         except WebDriverException as e:
             result["error"] = f"WebDriver error: {str(e)}"
+        except requests.RequestException as e:
+            result["error"] = f"HTTP error: {str(e)}"
         except Exception as e:
             result["error"] = f"Unexpected error: {str(e)}"
         
+        result["timing"]["total"] = round(time.perf_counter() - started, 3)
+        return result
+    
+    @staticmethod
+    def _serve_cached(result: Dict[str, Any], cached: Dict[str, Any], started: float) -> Dict[str, Any]:
+        """Complete `result` from the cache entry of a page that did not change"""
+        result["tier"] = result.get("tier") or "http"
+        result["data"] = cached["data"]
+        result["unchanged"] = True
+        result["success"] = True
+        result["timing"]["total"] = round(time.perf_counter() - started, 3)
+        print(f"Unchanged since last run: {result['url']}")
         return result
     
-    def parse_all_competitors(self) -> List[Dict[str, Any]]:
-        """Parse all competitor URLs from config"""
-        results = []
-        for url in COMPETITOR_URLS:
-            result = self.parse_url(url)
-            results.append(result)
-            time.sleep(2)  # Be polite with delays
+    @staticmethod
+    def _extract(page_source: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        data = extract_page_data(page_source)
+        elapsed = time.perf_counter() - started
+        _EXTRACT_SECONDS.observe(elapsed)
+        result["timing"]["extract"] = round(elapsed, 3)
+        return data
+    
+    def _fetch_http(self, url: str, result: Dict[str, Any],
+                    cached: Optional[Dict[str, Any]] = None) -> requests.Response:
+        """Fetch the page with a plain pooled HTTP GET, conditional on the cached validators"""
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
         
-        return results
+        started = time.perf_counter()
+        response = get_http_session().get(url, headers=headers, timeout=HTTP_TIMEOUT)
+        elapsed = time.perf_counter() - started
+        _HTTP_FETCH_SECONDS.observe(elapsed)
+        result["timing"]["fetch"] = round(elapsed, 3)
+        if response.status_code == 304:
+            if not cached:
+                raise requests.RequestException("Not Modified without a cached copy")
+            return response
+        response.raise_for_status()
+        content_type = response.headers.get("Content-Type", "")
+        if "html" not in content_type:
+            raise requests.RequestException(f"Unexpected content type: {content_type}")
+        return response
     
-    def close(self):
-        """Close the WebDriver"""
-        if self.driver:
-            self.driver.quit()
-            self.driver = None
+    def _fetch_selenium(self, url: str, settings: Dict[str, Any], result: Dict[str, Any]) -> str:
+        """Render the page in a pooled Chrome of the site's fetch profile and return the resulting DOM"""
+        started = time.perf_counter()
+        pool = self.pool or get_driver_pool(settings.get("profile", FETCH_PROFILE))
+        result["profile"] = pool.profile
+        with pool.lease() as lease:
+            _DRIVER_LEASE_SECONDS.observe(time.perf_counter() - started)
+            try:
+                lease.pages += 1
+                drain_network_log(lease.driver)  # Drop events of the previous page
+                load_started = time.perf_counter()
+                lease.driver.get(url)
+                load_seconds = time.perf_counter() - load_started
+                _PAGE_LOAD_SECONDS.observe(load_seconds)
+                result["timing"]["load"] = round(load_seconds, 3)
+                
+                # Wait for dynamic content to load
+                readiness = wait_for_page(lease.driver, settings)
+                result["timing"]["wait"] = readiness.pop("seconds")
+                _WAIT_SECONDS.observe(result["timing"]["wait"])
+                result["readiness"] = readiness
+                
+                # Get page source
+                page_source = lease.driver.page_source
+                result["final_url"] = lease.driver.current_url
+                result["transfer"] = drain_network_log(lease.driver)
+            except WebDriverException as e:
+                if not isinstance(e, TimeoutException):
+                    lease.mark_broken()
+                raise
+        result["timing"]["fetch"] = round(time.perf_counter() - started, 3)
+        return page_source
     
-    def save_to_history(self, results: List[Dict[str, Any]]):
-        """Save parsing results to history"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = os.path.join(HISTORY_DIR, f"parsing_results_{timestamp}.json")
+    def parse_all_competitors(self, urls: Optional[List[str]] = None,
+                              concurrent: Optional[bool] = None,
+                              max_workers: Optional[int] = None,
+                              use_cache: bool = True,
+                              on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+                              cancel: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
+        """
+        Parse all competitor URLs from config (or `urls`).
+        In concurrent mode up to `max_workers` sites are parsed at once, each on
+        its own pooled browser. Results are returned in input order.
+        `on_result(index, result)` is called as each site finishes. Once `cancel`
+        is set, sites not started yet are skipped with cancelled=True.
+        """
+        urls = list(COMPETITOR_URLS if urls is None else urls)
+        if concurrent is None:
+            concurrent = PARSING_CONCURRENT
+        workers = min(max_workers or PARSING_MAX_WORKERS, len(urls)) if concurrent else 1
+        throttle = HostThrottle()  # Be polite: delays apply per host
         
-        history_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "results": results
-        }
+        def parse(index: int) -> Dict[str, Any]:
+            url = urls[index]
+            if cancel is None or not cancel.is_set():
+                throttle.wait(url)
+            if cancel is not None and cancel.is_set():
+                result = {"url": url, "timestamp": datetime.now().isoformat(), "success": False,
+                          "cancelled": True, "error": "Cancelled", "data": {}}
+            else:
+                result = self.parse_url(url, use_cache=use_cache)
+            if on_result is not None:
+                on_result(index, result)
+            return result
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(history_entry, f, ensure_ascii=False, indent=2)
+        started = time.perf_counter()
+        if workers <= 1:
+            results = [parse(index) for index in range(len(urls))]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(parse, range(len(urls))))
         
-        print(f"Results saved to: {filename}")
-        return filename
+        if self.page_cache is not None:
+            self.page_cache.save()
+        
+        print(f"Parsed {len(results)} sites in {time.perf_counter() - started:.1f}s "
+              f"({workers} worker{'s' if workers != 1 else ''})")
+        return results
+    
+    def close(self):
+        """Release the service; pooled drivers stay warm for the next request"""
+        pass
+    
+    def save_to_history(self, results: List[Dict[str, Any]]) -> str:
+        """Save parsing results to history and return the run id"""
+        run_id = get_history_store().add_parsing_run(results)
+        print(f"Results saved to history run: {run_id}")
+        return run_id
 
 
 def get_parsing_service() -> ParsingService:
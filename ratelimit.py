@@ -0,0 +1,393 @@
+"""Client-side rate limiting, retries and adaptive concurrency for OpenAI requests"""
+import asyncio
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, AsyncIterator, Mapping, Optional, Union
+import openai
+from config import (
+    OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT, OPENAI_MAX_CONCURRENCY, OPENAI_MIN_CONCURRENCY,
+    OPENAI_MAX_RETRIES, OPENAI_RETRY_BASE, OPENAI_RETRY_MAX
+)
+
+# Fraction of the per-minute limits below which concurrency stops growing and shrinks instead
+NEAR_LIMIT = 0.1
+# Longest single sleep while waiting for capacity, so waiters re-check promptly
+_MAX_SLEEP = 1.0
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds of an x-ratelimit-reset-* value such as "20ms", "1s" or "6m0s" """
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * _DURATION_SECONDS[unit] for number, unit in parts)
+
+
+def _int_header(headers: Mapping[str, str], name: str) -> Optional[int]:
+    try:
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def is_retriable(error: Exception) -> bool:
+    """Connection problems, timeouts, 408/409/429 and server errors; an exhausted quota is not"""
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        if getattr(error, "code", None) == "insufficient_quota":
+            return False
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked to wait before retrying, if it said so"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    milliseconds = response.headers.get("retry-after-ms")
+    if milliseconds:
+        try:
+            return float(milliseconds) / 1000
+        except ValueError:
+            pass
+    return parse_duration(response.headers.get("retry-after"))
+
+
+class TokenBucket:
+    """Per-minute budget that refills continuously; the capacity follows the server's limit"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (a request larger than the capacity waits for a full bucket)"""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) * 60 / self.capacity
+
+    def take(self, amount: float):
+        self.level -= amount
+
+    def give(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+    def observe(self, limit: Optional[int], remaining: Optional[int], now: float):
+        """Align with the limit and remaining budget reported by the server"""
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+
+    def fraction(self) -> float:
+        return max(0.0, self.level) / self.capacity if self.capacity else 0.0
+
+
+class Slot:
+    """One admitted request: its token reservation and what its response reported"""
+
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+        self.headers: Optional[Mapping[str, str]] = None
+        self.used_tokens: Optional[int] = None
+        self.error: Optional[Exception] = None
+
+    def observe(self, headers: Mapping[str, str], used_tokens: Optional[int] = None):
+        self.headers = headers
+        self.used_tokens = used_tokens
+
+
+class _ThreadWaiter:
+    """A thread queued for a slot"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def wake(self):
+        self._event.set()
+
+    def clear(self):
+        self._event.clear()
+
+    def wait(self, timeout: Optional[float]):
+        self._event.wait(timeout)
+
+
+class _TaskWaiter:
+    """A task queued for a slot; woken thread-safely through its event loop"""
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def wake(self):
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:  # Loop closed; the waiter is gone with it
+            pass
+
+    def clear(self):
+        self._event.clear()
+
+    async def wait(self, timeout: Optional[float]):
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+_Waiter = Union[_ThreadWaiter, _TaskWaiter]
+
+
+class RateLimiter:
+    """
+    Shared limiter for all OpenAI requests, from threads and the event loop
+    alike. Requests wait for room in a requests/min and a tokens/min bucket,
+    both corrected by the x-ratelimit-* headers of every response. The number
+    of requests in flight adapts AIMD-style: it grows by one per window of
+    successes, stops growing and shrinks while the remaining budget is under
+    NEAR_LIMIT and halves on a 429. Retriable errors are retried with jittered
+    exponential backoff. Waiting requests are admitted first come, first
+    served; only the head of the queue watches the buckets, the rest sleep
+    until it is admitted.
+    """
+
+    def __init__(self, rpm: int = OPENAI_RPM_LIMIT, tpm: int = OPENAI_TPM_LIMIT,
+                 max_concurrency: int = OPENAI_MAX_CONCURRENCY, min_concurrency: int = OPENAI_MIN_CONCURRENCY,
+                 max_retries: int = OPENAI_MAX_RETRIES, retry_base: float = OPENAI_RETRY_BASE,
+                 retry_max: float = OPENAI_RETRY_MAX):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.concurrency = float(self.max_concurrency)
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._counters = {"requests": 0, "retries": 0, "rate_limited": 0, "waited": 0.0}
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens: int, waiter: _Waiter) -> Optional[float]:
+        """
+        Admit the request and return 0, or return how long to wait before
+        trying again; None waits until the waiter is woken by a release or
+        by the request ahead of it being admitted
+        """
+        with self._lock:
+            if waiter not in self._waiters:
+                self._waiters.append(waiter)
+            if self._waiters[0] is not waiter:
+                return None
+            now = time.monotonic()
+            wait = self._paused_until - now
+            if wait <= 0 and self._in_flight >= int(self.concurrency):
+                return None
+            if wait <= 0:
+                wait = max(self.requests.delay(1, now), self.tokens.delay(tokens, now))
+            if wait > 0:
+                return min(wait, _MAX_SLEEP)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self._in_flight += 1
+            self._counters["requests"] += 1
+            self._waiters.popleft()
+            self._wake_next()
+            return 0.0
+
+    def _wake_next(self):
+        if self._waiters:
+            self._waiters[0].wake()
+
+    def _abandon(self, waiter: _Waiter):
+        """Drop a waiter that gave up (cancelled or interrupted) and let the next one in"""
+        with self._lock:
+            if waiter in self._waiters:
+                was_head = self._waiters[0] is waiter
+                self._waiters.remove(waiter)
+                if was_head:
+                    self._wake_next()
+
+    def _release(self, slot: Slot):
+        with self._lock:
+            now = time.monotonic()
+            self._in_flight -= 1
+            if slot.used_tokens is not None:
+                self.tokens.give(slot.tokens - slot.used_tokens)  # Settle the estimate
+            # Error responses (429s in particular) carry the rate limit headers too
+            headers = slot.headers
+            if headers is None:
+                headers = getattr(getattr(slot.error, "response", None), "headers", None)
+            if headers is not None:
+                self.requests.observe(_int_header(headers, "x-ratelimit-limit-requests"),
+                                      _int_header(headers, "x-ratelimit-remaining-requests"), now)
+                self.tokens.observe(_int_header(headers, "x-ratelimit-limit-tokens"),
+                                    _int_header(headers, "x-ratelimit-remaining-tokens"), now)
+            status = getattr(slot.error, "status_code", None)
+            if status == 429:
+                self._counters["rate_limited"] += 1
+                self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                self._paused_until = max(self._paused_until, now + (retry_after(slot.error) or 0))
+            elif slot.error is None:
+                if min(self.requests.fraction(), self.tokens.fraction()) < NEAR_LIMIT:
+                    self.concurrency = max(self.min_concurrency, self.concurrency - 1 / self.concurrency)
+                else:
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self._wake_next()
+
+    def _waited(self, seconds: float):
+        with self._lock:
+            self._counters["waited"] += seconds
+
+    @contextmanager
+    def slot(self, tokens: int) -> Iterator[Slot]:
+        """Hold a request slot for the block; blocks the thread until one is free"""
+        waiter = _ThreadWaiter()
+        started = time.monotonic()
+        try:
+            while True:
+                waiter.clear()
+                wait = self._try_acquire(tokens, waiter)
+                if wait == 0:
+                    break
+                waiter.wait(wait)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        if (waited := time.monotonic() - started) > 0.001:
+            self._waited(waited)
+        slot = Slot(tokens)
+        try:
+            yield slot
+        except BaseException as e:
+            slot.error = e
+            raise
+        finally:
+            self._release(slot)
+
+    @asynccontextmanager
+    async def slot_async(self, tokens: int) -> AsyncIterator[Slot]:
+        """slot() for the event loop"""
+        waiter = _TaskWaiter()
+        started = time.monotonic()
+        try:
+            while True:
+                waiter.clear()
+                wait = self._try_acquire(tokens, waiter)
+                if wait == 0:
+                    break
+                await waiter.wait(wait)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        if (waited := time.monotonic() - started) > 0.001:
+            self._waited(waited)
+        slot = Slot(tokens)
+        try:
+            yield slot
+        except BaseException as e:
+            slot.error = e
+            raise
+        finally:
+            self._release(slot)
+
+    def retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds before retry number `attempt` + 1, or None when the error is final"""
+        if attempt >= self.max_retries or not is_retriable(error):
+            return None
+        with self._lock:
+            self._counters["retries"] += 1
+        backoff = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))  # Full jitter
+        return max(backoff, retry_after(error) or 0.0)
+
+    def call(self, send: Callable[[], Any], tokens: int) -> Any:
+        """
+        Send a request made through `with_raw_response` within the limits,
+        retrying retriable errors, and return the parsed response
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.slot(tokens) as slot:
+                    raw = send()
+                    response = raw.parse()
+                    usage = getattr(response, "usage", None)
+                    slot.observe(raw.headers, getattr(usage, "total_tokens", None))
+                    return response
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            time.sleep(delay)
+
+    async def call_async(self, send: Callable[[], Awaitable[Any]], tokens: int) -> Any:
+        """call() for the event loop"""
+        attempt = 0
+        while True:
+            try:
+                async with self.slot_async(tokens) as slot:
+                    raw = await send()
+                    response = raw.parse()
+                    usage = getattr(response, "usage", None)
+                    slot.observe(raw.headers, getattr(usage, "total_tokens", None))
+                    return response
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            return dict(
+                self._counters,
+                waited=round(self._counters["waited"], 3),
+                in_flight=self._in_flight,
+                concurrency=round(self.concurrency, 2),
+                rpm_limit=int(self.requests.capacity),
+                rpm_available=int(max(0.0, self.requests.level)),
+                tpm_limit=int(self.tokens.capacity),
+                tpm_available=int(max(0.0, self.tokens.level))
+            )
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get or create the process-wide rate limiter"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
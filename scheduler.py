@@ -0,0 +1,275 @@
+"""In-process asyncio scheduler that keeps re-parsing competitor sites"""
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+from config import (
+    COMPETITOR_URLS, SCHEDULER_DB_FILE, SCHEDULE_INTERVAL, SCHEDULE_JITTER, SCHEDULER_MAX_CONCURRENCY,
+    SCHEDULER_HOST_CONCURRENCY, SCHEDULE_BACKOFF_BASE, SCHEDULE_BACKOFF_MAX, SCHEDULE_REANALYZE
+)
+from parsingservice import ParsingService, HostThrottle, get_parsing_service, get_site_settings
+from pagediff import diff_results, reanalyze_changes
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL UNIQUE,
+    interval REAL NOT NULL,
+    jitter REAL NOT NULL,
+    paused INTEGER NOT NULL DEFAULT 0,
+    next_run REAL NOT NULL,
+    last_run REAL,
+    last_status TEXT,
+    last_error TEXT,
+    failures INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Longest sleep between checks for due schedules
+_MAX_IDLE = 60
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+def next_delay(interval: float, jitter: float, failures: int = 0) -> float:
+    """Seconds until the next run: the interval, or exponential backoff after failures, +/- jitter"""
+    if failures:
+        delay = min(SCHEDULE_BACKOFF_MAX, SCHEDULE_BACKOFF_BASE * 2 ** (failures - 1))
+    else:
+        delay = interval
+    return max(1.0, delay * (1 + random.uniform(-jitter, jitter)))
+
+
+class ScheduleStore:
+    """
+    Schedules persisted in SQLite so they survive restarts. The scheduler
+    calls it from worker threads, so connections are per thread.
+    """
+
+    def __init__(self, path: str = SCHEDULER_DB_FILE):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                connection.executescript(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def sync(self, urls: List[str]):
+        """
+        Add a schedule for every configured URL (first run spread over the
+        jitter window), apply current interval settings and drop schedules of
+        URLs no longer configured. Existing run state is kept.
+        """
+        now = time.time()
+        with self.connection:
+            for url in urls:
+                settings = get_site_settings(url)
+                interval = settings.get("interval", SCHEDULE_INTERVAL)
+                jitter = settings.get("jitter", SCHEDULE_JITTER)
+                self.connection.execute(
+                    "INSERT INTO schedules (url, interval, jitter, next_run) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (url) DO UPDATE SET interval = excluded.interval, jitter = excluded.jitter",
+                    (url, interval, jitter, now + random.uniform(0, interval * jitter))
+                )
+            placeholders = ", ".join("?" for _ in urls)
+            self.connection.execute(f"DELETE FROM schedules WHERE url NOT IN ({placeholders})", urls)
+
+    def all(self) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self.connection.execute("SELECT * FROM schedules ORDER BY id")]
+
+    def get(self, schedule_id: int) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute("SELECT * FROM schedules WHERE id = ?", (schedule_id,)).fetchone()
+        return dict(row) if row else None
+
+    def due(self, now: float) -> List[Dict[str, Any]]:
+        rows = self.connection.execute(
+            "SELECT * FROM schedules WHERE paused = 0 AND next_run <= ? ORDER BY next_run", (now,)
+        )
+        return [dict(row) for row in rows]
+
+    def next_run(self, after: float = 0.0) -> Optional[float]:
+        row = self.connection.execute(
+            "SELECT MIN(next_run) FROM schedules WHERE paused = 0 AND next_run > ?", (after,)
+        ).fetchone()
+        return row[0]
+
+    def update(self, schedule_id: int, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self.connection:
+            self.connection.execute(f"UPDATE schedules SET {assignments} WHERE id = ?",
+                                    list(fields.values()) + [schedule_id])
+
+
+class Scheduler:
+    """
+    Runs every due schedule on its own task, at most `max_concurrency` at a
+    time and at most SCHEDULER_HOST_CONCURRENCY per host (SITE_SETTINGS
+    "max_concurrency"). A schedule never overlaps itself. Successful runs are
+    diffed against the previous parse and stored in history. Failing sites
+    back off exponentially. The store is only used from worker threads, so
+    SQLite never blocks the event loop.
+    """
+
+    def __init__(self, store: Optional[ScheduleStore] = None, service: Optional[ParsingService] = None,
+                 max_concurrency: int = SCHEDULER_MAX_CONCURRENCY):
+        self.store = store or ScheduleStore()
+        self.service = service or get_parsing_service()
+        self.max_concurrency = max_concurrency
+        self.throttle = HostThrottle()
+        self._running: Dict[int, asyncio.Task] = {}
+        self._host_runs: Dict[str, int] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    async def start(self, urls: Optional[List[str]] = None):
+        """Sync schedules with the configured URLs and start the scheduling loop"""
+        await asyncio.to_thread(self.store.sync, list(COMPETITOR_URLS if urls is None else urls))
+        if self._loop_task is None:
+            self._loop_task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        """Stop scheduling and cancel runs in progress; they run again after restart"""
+        tasks = [task for task in (self._loop_task, *self._running.values()) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop_task = None
+        self._running.clear()
+        self._host_runs.clear()
+
+    async def list(self) -> List[Dict[str, Any]]:
+        schedules = []
+        for schedule in await asyncio.to_thread(self.store.all):
+            schedule.update(
+                paused=bool(schedule["paused"]),
+                running=schedule["id"] in self._running,
+                next_run=_iso(schedule["next_run"]),
+                last_run=_iso(schedule["last_run"])
+            )
+            schedules.append(schedule)
+        return schedules
+
+    async def pause(self, schedule_id: int) -> bool:
+        return await asyncio.to_thread(self._set_paused, schedule_id, 1)
+
+    async def resume(self, schedule_id: int) -> bool:
+        if not await asyncio.to_thread(self._set_paused, schedule_id, 0):
+            return False
+        self._wake.set()
+        return True
+
+    async def trigger(self, schedule_id: int) -> bool:
+        """Run a schedule now, even if it is paused or the concurrency limits are reached"""
+        schedule = await asyncio.to_thread(self.store.get, schedule_id)
+        if schedule is None:
+            return False
+        if schedule_id not in self._running:
+            self._start_run(schedule)
+        return True
+
+    def _set_paused(self, schedule_id: int, paused: int) -> bool:
+        if self.store.get(schedule_id) is None:
+            return False
+        self.store.update(schedule_id, paused=paused)
+        return True
+
+    async def _loop(self):
+        while True:
+            now = time.time()
+            if len(self._running) < self.max_concurrency:
+                for schedule in await asyncio.to_thread(self.store.due, now):
+                    if len(self._running) >= self.max_concurrency:
+                        break
+                    if schedule["id"] not in self._running and self._host_has_room(schedule["url"]):
+                        self._start_run(schedule)
+
+            # Due schedules left waiting can only start once a run finishes, which wakes the loop
+            next_run = await asyncio.to_thread(self.store.next_run, now)
+            if next_run is None or len(self._running) >= self.max_concurrency:
+                timeout = _MAX_IDLE
+            else:
+                timeout = min(_MAX_IDLE, max(0.0, next_run - time.time()))
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(timeout, 0.5))
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    def _host_has_room(self, url: str) -> bool:
+        limit = get_site_settings(url).get("max_concurrency", SCHEDULER_HOST_CONCURRENCY)
+        return self._host_runs.get(self._host(url), 0) < limit
+
+    def _start_run(self, schedule: Dict[str, Any]):
+        host = self._host(schedule["url"])
+        self._host_runs[host] = self._host_runs.get(host, 0) + 1
+        task = asyncio.ensure_future(self._run(schedule))
+        self._running[schedule["id"]] = task
+
+    async def _run(self, schedule: Dict[str, Any]):
+        schedule_id, url = schedule["id"], schedule["url"]
+        try:
+            result = await asyncio.to_thread(self._parse, url)
+            if result.get("success"):
+                changes = await asyncio.to_thread(diff_results, [result])
+                run_id = await asyncio.to_thread(self.service.save_to_history, [result])
+                if SCHEDULE_REANALYZE:
+                    await reanalyze_changes(changes, run_id)
+                failures, status, error = 0, changes[0]["status"], None
+            else:
+                failures, status, error = schedule["failures"] + 1, "failed", result.get("error")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            failures, status, error = schedule["failures"] + 1, "failed", str(e)
+        finally:
+            self._running.pop(schedule_id, None)
+            host = self._host(url)
+            self._host_runs[host] -= 1
+            if not self._host_runs[host]:
+                del self._host_runs[host]
+            self._wake.set()
+
+        await asyncio.to_thread(self._record_run, schedule, status, error, failures)
+        print(f"Scheduled parse of {url}: {status}")
+
+    def _record_run(self, schedule: Dict[str, Any], status: str, error: Optional[str], failures: int):
+        now = time.time()
+        current = self.store.get(schedule["id"]) or schedule
+        self.store.update(schedule["id"], last_run=now, last_status=status, last_error=error, failures=failures,
+                          next_run=now + next_delay(current["interval"], current["jitter"], failures))
+
+    def _parse(self, url: str) -> Dict[str, Any]:
+        self.throttle.wait(url)
+        result = self.service.parse_url(url)
+        if self.service.page_cache is not None:
+            self.service.page_cache.save()
+        return result
+
+
+_scheduler: Optional[Scheduler] = None
+
+
+def get_scheduler() -> Scheduler:
+    """Get or create the scheduler; call from the running event loop"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler()
+    return _scheduler
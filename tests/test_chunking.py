@@ -0,0 +1,70 @@
+"""split_text: structural boundaries and token budgets"""
+import pytest
+import chunking
+from chunking import CHARS_PER_TOKEN, estimate_tokens, split_text
+from extraction import extract_page_data
+
+
+@pytest.fixture(autouse=True)
+def char_estimate(monkeypatch):
+    """Characters-per-token counts, so budgets do not depend on tiktoken being installed"""
+    monkeypatch.setattr(chunking, "tiktoken", None)
+    monkeypatch.setattr(chunking, "_encoding", None)
+
+
+def sentence(i: int) -> str:
+    return f"Sentence number {i} says something about the product."
+
+
+def test_short_text_is_one_chunk():
+    assert split_text("  Just a little text.  ", 100) == ["Just a little text."]
+
+
+def test_estimate_without_tiktoken():
+    assert estimate_tokens("a" * (CHARS_PER_TOKEN * 10 + 1)) == 11
+
+
+def test_chunks_keep_to_the_budget():
+    text = "\n\n".join(" ".join(sentence(p * 10 + s) for s in range(10)) for p in range(20))
+    chunks = split_text(text, 120)
+    assert len(chunks) > 1
+    # Joiners between packed pieces may add a token or two
+    assert all(estimate_tokens(chunk) <= 120 + 2 for chunk in chunks)
+    assert " ".join(" ".join(chunks).split()) == " ".join(text.split())
+
+
+def test_splits_on_paragraphs_before_sentences():
+    paragraphs = [" ".join(sentence(p * 3 + s) for s in range(3)) for p in range(6)]
+    budget = estimate_tokens(paragraphs[0]) * 2 + 2
+    chunks = split_text("\n\n".join(paragraphs), budget)
+    assert chunks == ["\n\n".join(paragraphs[i:i + 2]) for i in range(0, 6, 2)]
+
+
+def test_oversized_paragraph_falls_back_to_sentences():
+    long_paragraph = " ".join(sentence(i) for i in range(40))
+    chunks = split_text(f"Intro.\n\n{long_paragraph}", 100)
+    assert all(chunk.rstrip().endswith(".") for chunk in chunks)
+    assert all(estimate_tokens(chunk) <= 102 for chunk in chunks)
+
+
+def test_markdown_headings_start_chunks():
+    sections = [f"# Section {i}\n" + " ".join(sentence(i * 5 + s) for s in range(5)) for i in range(4)]
+    chunks = split_text("\n".join(sections), estimate_tokens(sections[0]) + 5)
+    assert [chunk.split("\n")[0] for chunk in chunks] == [f"# Section {i}" for i in range(4)]
+
+
+def test_text_without_separators_is_hard_split():
+    chunks = split_text("x" * 1000, 50)
+    assert "".join(chunks) == "x" * 1000
+    assert all(estimate_tokens(chunk) <= 50 for chunk in chunks)
+
+
+def test_page_text_splits_on_heading_sections():
+    body = "".join(
+        f"<h2>Section {i}</h2>" + "".join(f"<p>{sentence(i * 4 + s)}</p>" for s in range(4))
+        for i in range(5)
+    )
+    text = extract_page_data(f"<html><body><main>{body}</main></body></html>")["text_content"]
+    section_tokens = estimate_tokens(text) // 5
+    chunks = split_text(text, section_tokens + 10)
+    assert [chunk.split("\n")[0] for chunk in chunks] == [f"Section {i}" for i in range(5)]
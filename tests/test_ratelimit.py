@@ -0,0 +1,121 @@
+"""RateLimiter: token buckets, rate limit headers, AIMD concurrency and FIFO admission"""
+import asyncio
+import httpx
+import openai
+import pytest
+from ratelimit import RateLimiter, TokenBucket, parse_duration
+
+
+def rate_limit_error(headers=None) -> openai.RateLimitError:
+    response = httpx.Response(429, headers=headers or {}, request=httpx.Request("POST", "http://api.test/v1"))
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def limiter(**kwargs) -> RateLimiter:
+    options = dict(rpm=10000, tpm=1000000, max_concurrency=8, min_concurrency=1)
+    options.update(kwargs)
+    return RateLimiter(**options)
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("20ms", 0.02), ("1s", 1.0), ("6m0s", 360.0), ("1h2m", 3720.0), ("1.5", 1.5), ("", None), ("soon", None)
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == seconds
+
+
+def test_bucket_refills_continuously():
+    bucket = TokenBucket(60)
+    bucket.take(60)
+    now = bucket._updated
+    assert bucket.delay(1, now) == pytest.approx(1.0)
+    assert bucket.delay(1, now + 0.5) == pytest.approx(0.5)
+    assert bucket.delay(1, now + 1) == 0
+    bucket._refill(now + 600)
+    assert bucket.level == 60  # Never above the capacity
+
+
+def test_bucket_request_larger_than_capacity_waits_for_a_full_bucket():
+    bucket = TokenBucket(60)
+    bucket.take(30)
+    assert bucket.delay(1000, bucket._updated) == pytest.approx(30.0)
+
+
+def test_headers_update_the_buckets():
+    rate_limiter = limiter()
+    with rate_limiter.slot(100) as slot:
+        slot.observe({
+            "x-ratelimit-limit-requests": "500", "x-ratelimit-remaining-requests": "400",
+            "x-ratelimit-limit-tokens": "30000", "x-ratelimit-remaining-tokens": "1200"
+        })
+    stats = rate_limiter.stats()
+    assert stats["rpm_limit"] == 500 and stats["rpm_available"] == 400
+    assert stats["tpm_limit"] == 30000 and stats["tpm_available"] == 1200
+
+
+def test_usage_settles_the_reservation():
+    rate_limiter = limiter(tpm=10000)
+    with rate_limiter.slot(3000) as slot:
+        assert rate_limiter.stats()["tpm_available"] == 7000
+        slot.observe({}, used_tokens=1000)
+    assert rate_limiter.stats()["tpm_available"] == 9000
+
+
+def test_concurrency_grows_additively_on_success():
+    rate_limiter = limiter()
+    rate_limiter.concurrency = 4.0
+    for _ in range(4):
+        with rate_limiter.slot(10):
+            pass
+    assert 4.9 < rate_limiter.concurrency < 5.0
+
+
+def test_concurrency_halves_on_429_and_pauses_for_retry_after():
+    rate_limiter = limiter()
+    with pytest.raises(openai.RateLimitError):
+        with rate_limiter.slot(10):
+            raise rate_limit_error({"retry-after-ms": "200"})
+    assert rate_limiter.concurrency == 4
+    assert rate_limiter.stats()["rate_limited"] == 1
+    assert rate_limiter._try_acquire(10, object()) == pytest.approx(0.2, abs=0.05)
+
+
+def test_concurrency_shrinks_near_the_limit():
+    rate_limiter = limiter()
+    with rate_limiter.slot(10) as slot:
+        slot.observe({"x-ratelimit-limit-tokens": "1000000", "x-ratelimit-remaining-tokens": "1000"})
+    assert rate_limiter.concurrency < 8
+    rate_limiter.concurrency = 1.0
+    with rate_limiter.slot(10) as slot:
+        slot.observe({"x-ratelimit-limit-tokens": "1000000", "x-ratelimit-remaining-tokens": "1000"})
+    assert rate_limiter.concurrency == 1  # Not below min_concurrency
+
+
+def test_retry_delay():
+    rate_limiter = limiter()
+    assert rate_limiter.retry_delay(rate_limit_error({"retry-after": "2"}), 0) >= 2
+    assert rate_limiter.retry_delay(rate_limit_error(), rate_limiter.max_retries) is None
+    assert rate_limiter.retry_delay(ValueError("bad request body"), 0) is None
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    rate_limiter = limiter(max_concurrency=2)
+    admitted = []
+
+    async def request(i: int):
+        async with rate_limiter.slot_async(10):
+            admitted.append(i)
+            await asyncio.sleep(0.02)
+
+    async def main():
+        tasks = []
+        for i in range(8):
+            tasks.append(asyncio.ensure_future(request(i)))
+            await asyncio.sleep(0.001)
+        tasks[4].cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+    assert admitted == [0, 1, 2, 3, 5, 6, 7]
+    assert rate_limiter.stats()["in_flight"] == 0
+    assert not rate_limiter._waiters